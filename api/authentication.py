@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.state import User
+
+# Saving or deleting a user stores a new random version under its key in
+# the shared cache (api.signals), replacing all users stores a new
+# generation. Random values can't come back after the key is culled.
+GENERATION_KEY = 'api_user:generation'
+
+
+def version_key(user_id):
+    return f'api_user:{user_id}'
+
+
+def new_version(*keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def current_version(user_id):
+    versions = cache.get_many([GENERATION_KEY, version_key(user_id)])
+    return versions.get(GENERATION_KEY), versions.get(version_key(user_id))
+
+
+class UserCache:
+    """Field values of recently authenticated users of this process.
+
+    Holds at most API_USER_CACHE_SIZE users, the least recently used go
+    first, for API_USER_CACHE_TTL seconds at most. An entry is used only
+    with the version it was stored with, so a change made by any process
+    is seen by all of them at the next request.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = OrderedDict()
+
+    def get(self, user_id, version):
+        with self.lock:
+            expires, stored, values = self.users.get(
+                user_id, (0, None, None))
+            if expires < time.monotonic() or stored != version:
+                self.users.pop(user_id, None)
+                return None
+            self.users.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, version, values):
+        with self.lock:
+            self.users[user_id] = (
+                time.monotonic() + settings.API_USER_CACHE_TTL, version,
+                values)
+            self.users.move_to_end(user_id)
+            while len(self.users) > settings.API_USER_CACHE_SIZE:
+                self.users.popitem(last=False)
+
+    def evict(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # The token gives the user id; the user is built from cached field
+    # values instead of a query per request. Unknown and inactive users
+    # are never cached, JWTAuthentication rejects them as before.
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification'))
+        fields = [field.attname for field in User._meta.concrete_fields]
+        version = current_version(user_id)
+        values = user_cache.get(user_id, version)
+        if values is not None:
+            return User.from_db(DEFAULT_DB_ALIAS, fields, values)
+        user = super().get_user(validated_token)
+        user_cache.set(
+            user_id, version, [getattr(user, name) for name in fields])
+        return user
@@ -0,0 +1,31 @@
+import json
+
+from posts.models import Post
+from .filters import PostExportFilter
+from .serializers import PostSerializer
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 1 << 16
+
+
+def export_filter(params):
+    return PostExportFilter(params, queryset=Post.objects.select_related(
+        'author').only('id', 'text', 'pub_date', 'author__username').order_by(
+            'pub_date', 'id'))
+
+
+def ndjson(queryset, chunk_size=CHUNK_SIZE):
+    # One serializer and one fetchmany() batch of rows at a time; lines are
+    # joined into blocks so the server doesn't write every row separately.
+    serializer = PostSerializer()
+    lines, size = [], 0
+    for post in queryset.iterator(chunk_size=chunk_size):
+        line = json.dumps(
+            serializer.to_representation(post), ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines)
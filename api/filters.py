@@ -1,5 +1,7 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 from posts.models import Post
+from posts.search import search
 
 
 class PostFilter(filters.FilterSet):
@@ -8,3 +10,21 @@ class PostFilter(filters.FilterSet):
     class Meta:
         model = Post
         fields = ['group', ]
+
+
+class PostExportFilter(PostFilter):
+    # pub_date_after and pub_date_before, ISO 8601, both inclusive.
+    pub_date = filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta(PostFilter.Meta):
+        fields = ['group', 'pub_date']
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search(queryset, query)
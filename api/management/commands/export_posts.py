@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import export_filter, ndjson
+
+
+class Command(BaseCommand):
+    help = 'Stream posts as newline-delimited JSON, like /api/v1/posts/export/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', help='Group id')
+        parser.add_argument(
+            '--after', help='Published at or after, ISO 8601')
+        parser.add_argument(
+            '--before', help='Published at or before, ISO 8601')
+        parser.add_argument(
+            '--output', help='File to write (standard output by default)')
+
+    def handle(self, *args, **options):
+        params = {
+            'group': options['group'],
+            'pub_date_after': options['after'],
+            'pub_date_before': options['before'],
+        }
+        filterset = export_filter(
+            {name: value for name, value in params.items() if value})
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.writelines(ndjson(filterset.qs))
+        else:
+            for block in ndjson(filterset.qs):
+                self.stdout.write(block, ending='')
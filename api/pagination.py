@@ -0,0 +1,32 @@
+from rest_framework import pagination
+from rest_framework.response import Response
+
+
+class LinkHeaderMixin:
+    # Responses stay plain lists, neighbour pages are announced in the
+    # Link header (RFC 8288) like GitHub does.
+    def get_paginated_response(self, data):
+        links = [
+            f'<{url}>; rel="{rel}"'
+            for url, rel in ((self.get_next_link(), 'next'),
+                             (self.get_previous_link(), 'prev'))
+            if url
+        ]
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+
+class CursorPagination(LinkHeaderMixin, pagination.CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+
+class PageNumberPagination(LinkHeaderMixin, pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -2,9 +2,10 @@ from rest_framework import permissions
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
+    # Compares ids, obj.author would load the author for every check.
     def has_object_permission(self, request, view, obj):
         return bool(
             request.method in permissions.SAFE_METHODS or
-            (hasattr(obj, 'author') and obj.author == request.user) or
-            (hasattr(obj, 'user') and obj.user == request.user)
+            (hasattr(obj, 'author_id') and obj.author_id == request.user.pk) or
+            (hasattr(obj, 'user_id') and obj.user_id == request.user.pk)
         )
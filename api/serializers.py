@@ -1,12 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework.validators import UniqueTogetherValidator
 
-from posts.models import Post, Comment, Follow, Group
+from posts import batch
+from posts.graph import get_graph
+from posts.models import Post, Comment, Follow, Group, Suggestion
 
 User = get_user_model()
 
 
+class BatchListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return batch.create([model(**attrs) for attrs in validated_data])
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username')
@@ -14,6 +21,7 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'text', 'author', 'pub_date')
         model = Post
+        list_serializer_class = BatchListSerializer
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -23,6 +31,25 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'author', 'post', 'text', 'created')
         model = Comment
+        list_serializer_class = BatchListSerializer
+
+    def validate_post(self, post):
+        # Comments are created under /posts/<post_id>/comments/ only.
+        if post.pk != self.context['view'].parent_post.pk:
+            raise serializers.ValidationError(
+                'Комментарий относится к другой записи.')
+        return post
+
+
+class NotFollowingValidator:
+    # unique_following checked against the follow graph, not a query.
+    message = 'Вы уже подписаны на этого автора.'
+    requires_context = True
+
+    def __call__(self, attrs, serializer):
+        user = serializer.context['request'].user
+        if get_graph().is_following(user.pk, attrs['author'].pk):
+            raise serializers.ValidationError(self.message, code='unique')
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -36,12 +63,14 @@ class FollowSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('user', 'following')
         model = Follow
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=['user', 'following']
-            )
-        ]
+        list_serializer_class = BatchListSerializer
+        validators = [NotFollowingValidator()]
+
+
+class FollowBatchSerializer(FollowSerializer):
+    # Existing follows are skipped by posts.batch instead of rejected.
+    class Meta(FollowSerializer.Meta):
+        validators = []
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -50,3 +79,12 @@ class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'title')
         model = Group
+
+
+class SuggestionSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        read_only=True, slug_field='username')
+
+    class Meta:
+        fields = ('author', 'score')
+        model = Suggestion
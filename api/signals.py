@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.state import User
+
+from .authentication import (
+    GENERATION_KEY, new_version, user_cache, version_key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, using, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    user_cache.evict(user_id)
+    # After the commit: a process reloading the user earlier would read
+    # the old row and keep it under the new version.
+    transaction.on_commit(
+        lambda: new_version(version_key(user_id)), using=using)
+
+
+def users_replaced(sender, **kwargs):
+    # flush and migrate replace users without signals, ids get reused.
+    user_cache.clear()
+    new_version(GENERATION_KEY)
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, \
                                             TokenRefreshView
 
-from .views import PostViewset, CommentViewset, FolowViewset, GroupViewset
+from .views import PostViewset, CommentViewset, FolowViewset, GroupViewset, \
+    SuggestionViewset
 
 router = DefaultRouter()
 router.register('posts', PostViewset)
@@ -11,6 +12,7 @@ router.register(
     'posts/(?P<post_id>[^/.]+)/comments', CommentViewset, basename='comment')
 router.register('follow', FolowViewset)
 router.register('group', GroupViewset)
+router.register('suggestions', SuggestionViewset, basename='suggestion')
 
 urlpatterns = [
     path('v1/token/', TokenObtainPairView.as_view(),
@@ -1,60 +1,201 @@
+from django.db import IntegrityError, router, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework import mixins, viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated, \
+    IsAuthenticatedOrReadOnly
 from rest_framework.filters import SearchFilter
+from rest_framework.response import Response
 
 
-from posts.models import Post, Follow, Group
+from posts.conditional import conditional, make_etag
+from yatube.db import read_replica, replica_for
+from posts.models import Comment, Post, Follow, Group
+from posts.suggestions import suggestions_for
 from .serializers import PostSerializer, CommentSerializer, \
-    FollowSerializer, GroupSerializer
+    FollowSerializer, FollowBatchSerializer, GroupSerializer, \
+    NotFollowingValidator, SuggestionSerializer
 from .permissions import IsAuthorOrReadOnly
-from .filters import PostFilter
+from .export import export_filter, ndjson
+from .filters import FullTextSearchFilter, PostFilter
+from .pagination import PageNumberPagination
 
 
-class PostViewset(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class ConditionalMixin:
+    # ETag from a narrow query over the same page, checked before the
+    # objects are loaded and serialized.
+    etag_fields = ('id', )
+
+    def get_etag(self, objects):
+        return make_etag(self.request, *(
+            tuple(getattr(obj, field) for field in self.etag_fields)
+            for obj in objects
+        ))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Plain rows: deferred model instances would load the missing
+        # fields one query per object. The cursor needs the ordering.
+        fields = list(self.etag_fields)
+        get_ordering = getattr(self.paginator, 'get_ordering', None)
+        if get_ordering is not None:
+            fields += [field.lstrip('-') for field in get_ordering(
+                request, queryset, self)]
+        rows = queryset.values(*dict.fromkeys(fields))
+        page = self.paginate_queryset(rows)
+        etag = make_etag(request, *(
+            tuple(row[field] for field in self.etag_fields)
+            for row in (rows if page is None else page)
+        ))
+        return conditional(request, etag, lambda: super(
+            ConditionalMixin, self).list(request, *args, **kwargs))
+
+
+class ConditionalRetrieveMixin(ConditionalMixin):
+    # Separate from ConditionalMixin: the router adds a detail route to
+    # every viewset that has retrieve().
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return conditional(
+            request, self.get_etag([instance]),
+            lambda: Response(self.get_serializer(instance).data))
+
+
+class ReplicaListMixin:
+    def list(self, request, *args, **kwargs):
+        with read_replica(request):
+            return super().list(request, *args, **kwargs)
+
+
+class BatchCreateMixin:
+    # POST <list>/batch/ with an array: every item is validated, then all
+    # of them are inserted with bulk_create in one transaction. Errors are
+    # returned as a list with one entry per item.
+    batch_size = 100
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAuthenticated])
+    def batch(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            raise ValidationError('Ожидается список объектов.')
+        if len(request.data) > self.batch_size:
+            raise ValidationError(
+                f'Не больше {self.batch_size} объектов за запрос.')
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class PostViewset(ReplicaListMixin, BatchCreateMixin,
+                  ConditionalRetrieveMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.select_related('author')
     serializer_class = PostSerializer
     permission_classes = [IsAuthorOrReadOnly, ]
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
     filterset_class = PostFilter
+    ordering = ('-pub_date', '-id')
+    etag_fields = ('id', 'version', 'pub_date')
+
+    @property
+    def paginator(self):
+        # Search results are ordered by rank, which a cursor can't encode.
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get(
+                    FullTextSearchFilter.search_param):
+                self._paginator = PageNumberPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False)
+    def export(self, request):
+        # Newline-delimited JSON of all matching posts, oldest first.
+        filterset = export_filter(request.query_params)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        # Rows are read after the view returns, outside of read_replica().
+        return StreamingHttpResponse(
+            ndjson(filterset.qs.using(replica_for(request))),
+            content_type='application/x-ndjson')
 
-class CommentViewset(viewsets.ModelViewSet):
+
+class CommentViewset(ReplicaListMixin, BatchCreateMixin,
+                     ConditionalRetrieveMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthorOrReadOnly, ]
+    ordering = ('-created', '-id')
+    etag_fields = ('id', 'text', 'created')
+
+    @cached_property
+    def parent_post(self):
+        return get_object_or_404(
+            Post.objects.only('id'), id=self.kwargs['post_id'])
 
     def get_queryset(self):
-        post = get_object_or_404(
-            Post.objects.prefetch_related('comments'),
-            id=self.kwargs['post_id']
-        )
-        return post.comments.all()
+        return Comment.objects.filter(
+            post=self.parent_post).select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class FolowViewset(mixins.CreateModelMixin,
+class FolowViewset(ReplicaListMixin,
+                   BatchCreateMixin,
+                   ConditionalMixin,
+                   mixins.CreateModelMixin,
                    mixins.ListModelMixin,
                    viewsets.GenericViewSet):
-    queryset = Follow.objects.all()
+    queryset = Follow.objects.select_related('user', 'author')
     serializer_class = FollowSerializer
     permission_classes = [IsAuthorOrReadOnly, ]
     filter_backends = [SearchFilter]
     search_fields = ['=author__username', '=user__username']
+    ordering = ('id', )
+
+    def get_serializer_class(self):
+        if self.action == 'batch':
+            return FollowBatchSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The graph of this process may miss a follow made elsewhere.
+        try:
+            with transaction.atomic(using=router.db_for_write(Follow)):
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError(
+                {'following': [NotFollowingValidator.message]},
+                code='unique')
 
 
-class GroupViewset(mixins.CreateModelMixin,
+class GroupViewset(ReplicaListMixin,
+                   ConditionalMixin,
+                   mixins.CreateModelMixin,
                    mixins.ListModelMixin,
                    viewsets.GenericViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, ]
+    ordering = ('id', )
+    etag_fields = ('id', 'title')
+
+
+class SuggestionViewset(viewsets.GenericViewSet):
+    # Top SUGGESTIONS_SIZE authors for the current user, read with one
+    # query from what update_suggestions stored; not paginated.
+    serializer_class = SuggestionSerializer
+    permission_classes = [IsAuthenticated, ]
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            suggestions_for(request.user), many=True)
+        return Response(serializer.data)
@@ -0,0 +1,119 @@
+"""Compare the shared SQLite cache with LocMemCache and FileBasedCache.
+
+    python benchmarks/cache_backends.py [--ops 5000] [--workers 4]
+
+Single process: operations per second for get/set/get_many/set_many/incr.
+Multi process: hit rate of a fragment written by one worker and read by
+the others, which is what gunicorn workers see for ``{% cache %}``.
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache.backends.filebased import FileBasedCache  # noqa: E402
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from yatube.cache import SQLiteCache  # noqa: E402
+
+PARAMS = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+FRAGMENT = '<div class="card">' + 'x' * 2000 + '</div>'
+
+
+def backends(tmp_dir):
+    return {
+        'locmem': lambda: LocMemCache('bench', PARAMS),
+        'filebased': lambda: FileBasedCache(
+            os.path.join(tmp_dir, 'files'), PARAMS),
+        'sqlite': lambda: SQLiteCache(
+            os.path.join(tmp_dir, 'cache.sqlite3'), PARAMS),
+    }
+
+
+def timed(fn, ops):
+    start = time.perf_counter()
+    fn()
+    return ops / (time.perf_counter() - start)
+
+
+def single_process(cache, ops):
+    keys = [f'post:{i}' for i in range(ops)]
+    batches = [keys[i:i + 10] for i in range(0, ops, 10)]
+    cache.set('counter', 0)
+    return {
+        'set': timed(lambda: [cache.set(k, FRAGMENT) for k in keys], ops),
+        'get': timed(lambda: [cache.get(k) for k in keys], ops),
+        'set_many/10': timed(lambda: [
+            cache.set_many({k: FRAGMENT for k in b}) for b in batches], ops),
+        'get_many/10': timed(
+            lambda: [cache.get_many(b) for b in batches], ops),
+        'incr': timed(lambda: [cache.incr('counter') for _ in keys], ops),
+    }
+
+
+def writer(factory, written):
+    factory().set_many({f'fragment:{i}': FRAGMENT for i in range(100)})
+    written.set()
+
+
+def reader(factory, ops, written, queue):
+    cache = factory()
+    written.wait()
+    hits = sum(cache.get(f'fragment:{i % 100}') is not None
+               for i in range(ops))
+    queue.put(hits)
+
+
+def shared_hit_rate(factory, ops, workers):
+    # Workers are forked before anything is cached, like gunicorn workers:
+    # one of them renders the fragments, the others try to reuse them.
+    ctx = get_context('fork')
+    written, queue = ctx.Event(), ctx.Queue()
+    processes = [ctx.Process(target=reader,
+                             args=(factory, ops, written, queue))
+                 for _ in range(workers - 1)]
+    processes.append(ctx.Process(target=writer, args=(factory, written)))
+    for process in processes:
+        process.start()
+    hits = sum(queue.get() for _ in range(workers - 1))
+    for process in processes:
+        process.join()
+    return hits / (ops * (workers - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    results = {}
+    for name in ('locmem', 'filebased', 'sqlite'):
+        with TemporaryDirectory() as tmp_dir:
+            factory = backends(tmp_dir)[name]
+            results[name] = {'hit rate': shared_hit_rate(
+                factory, args.ops, args.workers)}
+            results[name].update(single_process(factory(), args.ops))
+
+    columns = list(next(iter(results.values())))
+    print(f'{"backend":<10}' + ''.join(f'{c:>14}' for c in columns))
+    for name, row in results.items():
+        cells = ''.join(
+            f'{row[c]:>14.0%}' if c == 'hit rate' else f'{row[c]:>14,.0f}'
+            for c in columns)
+        print(f'{name:<10}{cells}')
+    print('ops/sec per operation; hit rate across '
+          f'{args.workers} worker processes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Feed reads while comments and follows are written, per SQLite profile.
+
+    python benchmarks/sqlite_load.py [--seconds 10] [--readers 4] [--writers 2]
+
+``default`` is Django's sqlite3 backend as shipped (rollback journal,
+deferred transactions), ``production`` is yatube.sqlite with
+SQLITE_PRAGMAS. Every worker is a separate process, like gunicorn
+workers. A write is a comment, a follow toggle and a batch of follows;
+"locked" counts operations that failed with database is locked.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+USERS = 50
+POSTS = 2000
+
+PROFILES = {
+    'default': 'django.db.backends.sqlite3',
+    'production': 'yatube.sqlite',
+}
+
+
+def setup_django(path, engine):
+    from django.conf import settings
+    settings.DATABASES = {'default': {'ENGINE': engine, 'NAME': path}}
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.DEBUG = False
+    import django
+    django.setup()
+
+
+def populate(path, engine):
+    setup_django(path, engine)
+    from django.core.management import call_command
+    from posts.models import Post, User
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    User.objects.bulk_create(
+        User(username=f'user{i}') for i in range(USERS))
+    users = list(User.objects.all())
+    Post.objects.bulk_create(
+        Post(text='x' * 500, author=random.choice(users))
+        for _ in range(POSTS))
+
+
+def read(deadline):
+    from posts.models import Post, User
+    ops = 0
+    while time.monotonic() < deadline:
+        list(Post.objects.select_related('author', 'group')[:10])
+        author = User.objects.get(pk=random.randint(1, USERS))
+        list(Post.objects.filter(author=author)[:10])
+        ops += 1
+    return ops
+
+
+def write(deadline):
+    from posts import batch
+    from posts.models import Comment, Follow, Post, User
+    ops = 0
+    while time.monotonic() < deadline:
+        user, author = random.sample(range(1, USERS + 1), 2)
+        Comment.objects.create(
+            post=Post.objects.get(pk=random.randint(1, POSTS)),
+            author_id=user, text='comment')
+        follow, created = Follow.objects.get_or_create(
+            user=User(pk=user), author=User(pk=author))
+        if not created:
+            follow.delete()
+        # Reads, then writes in one transaction (POST /api/v1/follow/batch/).
+        batch.create_follows([
+            Follow(user_id=user, author_id=other)
+            for other in random.sample(range(1, USERS + 1), 5)
+            if other != user])
+        ops += 1
+    return ops
+
+
+def worker(path, engine, role, seconds, queue):
+    from django.db.utils import OperationalError
+    setup_django(path, engine)
+    deadline = time.monotonic() + seconds
+    ops = locked = 0
+    while time.monotonic() < deadline:
+        try:
+            ops += (read if role == 'read' else write)(deadline)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+    queue.put((role, ops, locked))
+
+
+def run(profile, args):
+    engine = PROFILES[profile]
+    ctx = get_context('spawn')
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'db.sqlite3')
+        setup = ctx.Process(target=populate, args=(path, engine))
+        setup.start()
+        setup.join()
+        queue = ctx.Queue()
+        roles = ['read'] * args.readers + ['write'] * args.writers
+        processes = [
+            ctx.Process(target=worker,
+                        args=(path, engine, role, args.seconds, queue))
+            for role in roles]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    totals = {}
+    for role, ops, locked in results:
+        done, errors = totals.get(role, (0, 0))
+        totals[role] = (done + ops, errors + locked)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, '
+          f'{args.seconds:.0f}s')
+    print(f'{"profile":<12}{"reads/s":>10}{"writes/s":>10}'
+          f'{"locked r":>10}{"locked w":>10}')
+    for profile in PROFILES:
+        totals = run(profile, args)
+        reads, read_locked = totals.get('read', (0, 0))
+        writes, write_locked = totals.get('write', (0, 0))
+        print(f'{profile:<12}{reads / args.seconds:>10.0f}'
+              f'{writes / args.seconds:>10.0f}'
+              f'{read_locked:>10}{write_locked:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Latency percentiles and query counts for every page and API route.
+
+    python benchmarks/views.py [--requests 30] [--save results.json]
+    python benchmarks/views.py --compare benchmarks/baselines/views.json
+
+Seeds a temporary database with posts.generate (``--users``,
+``--posts``, ``--comments``, average ``--follows`` per user), then
+requests every GET route of posts/urls.py and api/urls.py as the most
+prolific author, after one warm-up request.
+``--compare`` exits with status 1 when a route's p50 or p90 grew by more
+than ``--threshold`` or it makes more queries than in the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+QUERY_PARAMS = {'search': {'q': 'дневник'}}
+
+
+def setup_django(tmp_dir):
+    from django.conf import settings
+    settings.DATABASES = {'default': {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': os.path.join(tmp_dir, 'db.sqlite3'),
+    }}
+    settings.CACHES = {'default': {
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(tmp_dir, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }}
+    settings.METRICS_DIR = os.path.join(tmp_dir, 'metrics')
+    # Static files aren't collected here.
+    settings.STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.StaticFilesStorage')
+    settings.DEBUG = False
+    import django
+    django.setup()
+
+
+def seed(args):
+    from django.core.management import call_command
+    from posts import suggestions
+    from posts.generate import Generator
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    Generator(args.users, 10, args.posts, args.comments, args.follows,
+              seed=args.seed).run()
+    suggestions.update()
+
+
+def routes():
+    # (name, callback) of every named pattern in posts.urls and api.urls.
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    def walk(patterns, included):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_name, '__name__', None)
+                yield from walk(pattern.url_patterns,
+                                included or module in ('posts.urls',
+                                                       'api.urls'))
+            elif (included and isinstance(pattern, URLPattern)
+                  and pattern.name and 'format' not in pattern.pattern.regex
+                  .groupindex):
+                yield pattern.name, pattern.callback
+
+    return sorted(dict(walk(get_resolver().url_patterns, False)).items())
+
+
+def allows_get(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    view_class = getattr(callback, 'view_class', None)
+    if view_class is not None:
+        return ('get' in view_class.http_method_names
+                and hasattr(view_class, 'get'))
+    return True
+
+
+def sample_kwargs():
+    from django.db.models import Count
+    from posts.models import Group, User
+
+    author = User.objects.annotate(posts=Count('author_posts')).order_by(
+        '-posts').first()
+    post = author.author_posts.order_by('-comment_count').first()
+    return author, {
+        'username': author.username,
+        'post_id': post.pk,
+        'slug': Group.objects.first().slug,
+        'pk': {'post-detail': post.pk,
+               'comment-detail': post.comments.first().pk},
+    }
+
+
+def measure(client, path, params, requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def get():
+        response = client.get(path, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    response = get()
+    latencies, queries = [], []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            get()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+    latencies.sort()
+    return {
+        'path': path,
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p90_ms': round(latencies[int(len(latencies) * 0.9)] * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        'queries': max(queries),
+    }
+
+
+def run(args):
+    from django.test import Client
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    seed(args)
+    author, kwargs = sample_kwargs()
+    web = Client()
+    web.force_login(author)
+    api = Client(HTTP_AUTHORIZATION=(
+        f'Bearer {RefreshToken.for_user(author).access_token}'))
+
+    results, skipped = {}, []
+    for name, callback in routes():
+        if not allows_get(callback):
+            skipped.append(name)
+            continue
+        params = {key: value.get(name) if isinstance(value, dict) else value
+                  for key, value in kwargs.items()}
+        pattern_kwargs = callback_kwargs(name, params)
+        path = reverse(name, kwargs=pattern_kwargs)
+        client = api if path.startswith('/api/') else web
+        results[name] = measure(
+            client, path, QUERY_PARAMS.get(name, {}), args.requests)
+    return results, skipped
+
+
+def callback_kwargs(name, params):
+    from django.urls import get_resolver
+
+    possibilities = get_resolver().reverse_dict.getlist(name)
+    names = set()
+    for possibility in possibilities:
+        for _, parameters in possibility[0]:
+            names.update(parameters)
+    names.discard('format')
+    return {key: params[key] for key in names}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for field in ('p50_ms', 'p90_ms'):
+            if row[field] > base[field] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {field} {base[field]} -> {row[field]}')
+        if row['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: queries {base["queries"]} -> {row["queries"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--save', help='Write results as a JSON baseline')
+    parser.add_argument('--compare', help='Baseline JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed latency growth (default 0.25)')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmp_dir:
+        setup_django(tmp_dir)
+        results, skipped = run(args)
+
+    print(f'{"route":<18}{"status":>7}{"p50 ms":>9}{"p90 ms":>9}'
+          f'{"p99 ms":>9}{"queries":>9}')
+    for name, row in results.items():
+        print(f'{name:<18}{row["status"]:>7}{row["p50_ms"]:>9.2f}'
+              f'{row["p90_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+              f'{row["queries"]:>9}')
+    print(f'not GET: {", ".join(skipped)}')
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'cpus': os.cpu_count(),
+                    'args': {name: value for name, value in vars(args).items()
+                             if name not in ('save', 'compare')},
+                },
+                'results': results,
+            }, output, indent=2, ensure_ascii=False)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(
+                results, json.load(baseline)['results'], args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
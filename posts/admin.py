@@ -4,7 +4,7 @@ from .models import Post, Group, Comment, Follow
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('text', 'pub_date', 'author')
+    list_display = ('text', 'pub_date', 'author', 'comment_count')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals
+
+        post_migrate.connect(signals.install_search_index, sender=self)
+        post_migrate.connect(signals.reload_follow_graph, sender=self)
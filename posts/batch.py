@@ -0,0 +1,91 @@
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import counters, graph, suggestions, timeline, trending
+from .models import Comment, Follow, Post
+
+
+def insert(model, objs, raw=False):
+    # bulk_create() skips save() and post_save: the callers below do what
+    # posts.signals would do for every row, once per batch. raw inserts
+    # the values as set on the objects, like loaddata: auto_now(_add)
+    # dates are not replaced with the current time.
+    using = router.db_for_write(model)
+    if raw:
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key]
+        size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+        for start in range(0, len(objs), size):
+            model._base_manager.using(using)._insert(
+                objs[start:start + size], fields=fields, raw=True)
+    else:
+        model.objects.using(using).bulk_create(objs)
+    if objs and objs[0].pk is None:
+        # Backends that don't return ids from bulk inserts hand out
+        # consecutive AUTOINCREMENT keys while the transaction holds
+        # the write lock.
+        last = model.objects.using(using).order_by('-pk').values_list(
+            'pk', flat=True)[0]
+        for pk, obj in enumerate(objs, last - len(objs) + 1):
+            obj.pk = pk
+            obj._state.adding = False
+            obj._state.db = using
+    return objs
+
+
+def create_posts(posts):
+    with transaction.atomic():
+        insert(Post, posts)
+        counters.posts_added(posts)
+        timeline.fan_out(*posts)
+        trending.record(trending.GROUP_POSTS, (
+            (post.group_id, post.pub_date, 1) for post in posts))
+    return posts
+
+
+def create_comments(comments):
+    with transaction.atomic():
+        insert(Comment, comments)
+        counters.comments_added(comments)
+        suggestions.comments_changed(comments)
+        trending.record(trending.POST_COMMENTS, (
+            (comment.post_id, comment.created, 1) for comment in comments))
+    return comments
+
+
+def create_follows(follows):
+    # Pairs that already exist, in the table or earlier in the batch,
+    # are skipped rather than failing unique_following.
+    with transaction.atomic():
+        pairs = {}
+        for follow in follows:
+            pairs.setdefault((follow.user_id, follow.author_id), follow)
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        follows = [follow for pair, follow in pairs.items()
+                   if pair not in existing]
+        insert(Follow, follows)
+        counters.follows_added(follows)
+        graph.followed(*follows)
+        for follow in follows:
+            timeline.backfill(follow.user_id, follow.author_id)
+        suggestions.follows_changed(follows)
+        now = timezone.now()
+        trending.record(trending.AUTHOR_FOLLOWS, (
+            (follow.author_id, now, 1) for follow in follows))
+    return follows
+
+
+CREATORS = {
+    Post: create_posts,
+    Comment: create_comments,
+    Follow: create_follows,
+}
+
+
+def create(objs):
+    if not objs:
+        return []
+    return CREATORS[type(objs[0])](objs)
@@ -0,0 +1,106 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.template import Context
+from django.template.loader import get_template
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+from .models import Group, Post, User
+from .thumbnails import prefetch
+
+# What reverse() leaves unquoted in an argument.
+URL_SAFE = RFC3986_SUBDELIMS + '/~:@'
+
+# Fields of authors and groups that the cards of their posts show.
+SHOWN_FIELDS = {User: ('username',), Group: ('title', 'slug')}
+
+
+def card_key(post, user, from_post=False):
+    # pub_date guards against reused ids after the database is reloaded.
+    created = int(post.pub_date.timestamp() * 1000000)
+    is_author = int(user.pk == post.author_id)
+    return (f'post_card:{post.pk}:{created}:{post.version}:'
+            f'{is_author}:{int(from_post)}')
+
+
+def shown_fields_changed(instance, using, update_fields=None):
+    fields = SHOWN_FIELDS[type(instance)]
+    if instance._state.adding or (
+            update_fields is not None and not set(fields) & update_fields):
+        return False
+    saved = type(instance)._default_manager.using(using).filter(
+        pk=instance.pk).values_list(*fields).first()
+    return saved not in (None, tuple(getattr(instance, f) for f in fields))
+
+
+def expire(instance, using):
+    # New versions change the card keys and the ETags of the pages.
+    field = 'author' if isinstance(instance, User) else 'group'
+    Post.objects.using(using).filter(**{field: instance}).update(
+        version=F('version') + 1)
+
+
+class UrlPattern:
+    """A URL reversed once with placeholder arguments, filled in with
+    each card's own, giving what reverse() would."""
+
+    def __init__(self, name, arity):
+        # Digits pass the str, slug and int converters alike.
+        markers = [str(i + 1) * 12 for i in range(arity)]
+        self.parts = [reverse(name, args=markers)]
+        for marker in markers:
+            self.parts[-1:] = self.parts[-1].split(marker)
+
+    def __call__(self, *args):
+        url = self.parts[0]
+        for arg, part in zip(args, self.parts[1:]):
+            url += quote(str(arg), safe=URL_SAFE) + part
+        return url
+
+
+class CardRenderer:
+    """post_item.html for the posts of one page: the template is looked
+    up, the URLs reversed and the context built once, each card only
+    pushes its own values."""
+
+    def __init__(self, request, from_post=False):
+        self.template = get_template('post_item.html').template
+        self.user = request.user
+        self.profile_url = UrlPattern('profile', 1)
+        self.group_url = UrlPattern('group', 1)
+        self.post_url = UrlPattern('post', 2)
+        self.edit_url = UrlPattern('post_edit', 2)
+        self.context = Context({
+            'from_post': from_post,
+            'placeholder': static('img/thumbnail_placeholder.svg'),
+        })
+
+    def render(self, post):
+        username = post.author.username
+        with self.context.push(
+                post=post,
+                is_author=self.user.pk == post.author_id,
+                profile_url=self.profile_url(username),
+                group_url=post.group and self.group_url(post.group.slug),
+                post_url=self.post_url(username, post.pk),
+                edit_url=self.edit_url(username, post.pk)):
+            return self.template.render(self.context)
+
+
+def render_cards(posts, request, from_post=False):
+    keys = [card_key(post, request.user, from_post) for post in posts]
+    cards = cache.get_many(keys)
+    prefetch([post for post, key in zip(posts, keys) if key not in cards])
+    missing = {}
+    renderer = None
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            renderer = renderer or CardRenderer(request, from_post)
+            cards[key] = missing[key] = renderer.render(post)
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [cards[key] for key in keys]
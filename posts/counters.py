@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _add(name, delta):
+    # A counter that drifted to 0 stays there rather than failing the
+    # unsigned column; reconcile_counters fixes it.
+    return Greatest(F(name) + delta, 0)
+
+
+def _bump_user(user_id, **deltas):
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: _add(name, delta) for name, delta in deltas.items()})
+
+
+def user_added(user):
+    UserStats.objects.get_or_create(user=user)
+
+
+def post_added(post, delta=1):
+    _bump_user(post.author_id, post_count=delta)
+
+
+def comment_added(comment, delta=1):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=_add('comment_count', delta), version=F('version') + 1)
+
+
+def follow_added(follow, delta=1):
+    _bump_user(follow.author_id, followers_count=delta)
+    _bump_user(follow.user_id, following_count=delta)
+
+
+def posts_added(posts):
+    for author_id, count in Counter(
+            post.author_id for post in posts).items():
+        _bump_user(author_id, post_count=count)
+
+
+def _bump_posts(counts):
+    for post_id, count in counts:
+        Post.objects.filter(pk=post_id).update(
+            comment_count=_add('comment_count', count),
+            version=F('version') + 1)
+
+
+def comments_added(comments):
+    _bump_posts(Counter(comment.post_id for comment in comments).items())
+
+
+def comments_deleted(comments):
+    # comments: a queryset, counted per post by the database.
+    _bump_posts(
+        (post_id, -count) for post_id, count in comments.order_by(
+            ).values_list('post_id').annotate(count=Count('pk')))
+
+
+def follows_added(follows):
+    for author_id, count in Counter(
+            follow.author_id for follow in follows).items():
+        _bump_user(author_id, followers_count=count)
+    for user_id, count in Counter(
+            follow.user_id for follow in follows).items():
+        _bump_user(user_id, following_count=count)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def _reconcile(queryset, **counters):
+    fixed = 0
+    for name, actual in counters.items():
+        fixed += queryset.annotate(actual=actual).exclude(
+            **{name: F('actual')}).update(**{name: actual})
+    return fixed
+
+
+def reconcile():
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)],
+        ignore_conflicts=True)
+    return _reconcile(
+        Post.objects.all(),
+        comment_count=_count(Comment, 'post'),
+    ) + _reconcile(
+        UserStats.objects.all(),
+        post_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
@@ -0,0 +1,209 @@
+import gzip
+import json
+import time
+from array import array
+from bisect import bisect_right
+
+from django.core.serializers.python import Deserializer
+from django.db import reset_queries, transaction
+
+from . import counters, graph, suggestions, timeline, trending
+from .batch import insert
+from .models import Comment, Follow, Group, Post, User
+
+# Parents before children: a record may only refer to records above it,
+# which is the order dumpdata writes these models in.
+MODELS = {
+    'auth.user': User,
+    'posts.group': Group,
+    'posts.post': Post,
+    'posts.comment': Comment,
+    'posts.follow': Follow,
+}
+
+# Rows that already exist with the same value are reused, not inserted.
+NATURAL_KEYS = {User: 'username', Group: 'slug'}
+
+READ_SIZE = 1 << 16
+# A record that doesn't parse within this many characters is malformed.
+MAX_RECORD_SIZE = 1 << 24
+# Decode errors this close to the end of the buffer may be a value cut by
+# the read (a partial "false" or number), more input decides.
+CUT_VALUE_SIZE = 16
+
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_records(stream):
+    # Yields the objects of a top level JSON array (dumpdata) or of JSON
+    # lines one at a time, holding at most one object and one read in
+    # memory. Malformed input raises ValueError with the character offset
+    # without reading further.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, offset = '', 0, False, 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            pos += 1
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as error:
+            if eof and pos == len(buffer):
+                return
+            incomplete = (error.pos >= len(buffer) - CUT_VALUE_SIZE
+                          or error.msg.startswith('Unterminated string'))
+            if eof or not incomplete:
+                raise ValueError(
+                    f'Malformed record at character {offset + error.pos}: '
+                    f'{error.msg}') from None
+            if len(buffer) - pos > MAX_RECORD_SIZE:
+                raise ValueError(
+                    f'Record at character {offset + pos} is longer than '
+                    f'{MAX_RECORD_SIZE} characters') from None
+            chunk = stream.read(READ_SIZE)
+            offset += pos
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        yield record
+        pos = end
+
+
+class IdMap:
+    # Dump pk -> database pk, stored as runs of consecutive keys in three
+    # arrays: a dump with sequential pks imported in order takes a few
+    # bytes however many rows it has.
+    def __init__(self):
+        self.old = array('q')
+        self.new = array('q')
+        self.length = array('q')
+        self.ordered = True
+
+    def __len__(self):
+        return sum(self.length)
+
+    def add(self, old, new):
+        if self.old:
+            end = self.old[-1] + self.length[-1]
+            if old == end and new == self.new[-1] + self.length[-1]:
+                self.length[-1] += 1
+                return
+            if old < end:
+                self.ordered = False
+        self.old.append(old)
+        self.new.append(new)
+        self.length.append(1)
+
+    def _sort(self):
+        order = sorted(range(len(self.old)), key=self.old.__getitem__)
+        self.old, self.new, self.length = (
+            array('q', (column[i] for i in order))
+            for column in (self.old, self.new, self.length))
+        self.ordered = True
+
+    def __getitem__(self, old):
+        if not self.ordered:
+            self._sort()
+        i = bisect_right(self.old, old) - 1
+        if i < 0 or old >= self.old[i] + self.length[i]:
+            raise KeyError(old)
+        return self.new[i] + old - self.old[i]
+
+
+class Importer:
+    def __init__(self, chunk_size=1000, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda *args: None)
+        self.ids = {model: IdMap() for model in MODELS.values()}
+        self.counts = {model: 0 for model in MODELS.values()}
+        self.skipped = 0
+
+    def _resolve(self, pk, obj):
+        for field in obj._meta.concrete_fields:
+            if field.is_relation and field.many_to_one:
+                value = getattr(obj, field.attname)
+                if value is not None:
+                    try:
+                        value = self.ids[field.related_model][value]
+                    except KeyError:
+                        raise ValueError(
+                            f'{obj._meta.label_lower} {pk}: '
+                            f'{field.name} {value} is not in the dump '
+                            f'before it')
+                    setattr(obj, field.attname, value)
+
+    def _reuse_existing(self, model, chunk):
+        field = NATURAL_KEYS.get(model)
+        if model is Follow:
+            seen = set(Follow.objects.filter(
+                user_id__in={obj.user_id for _, obj in chunk},
+                author_id__in={obj.author_id for _, obj in chunk},
+            ).values_list('user_id', 'author_id'))
+            new = []
+            for pk, obj in chunk:
+                if (obj.user_id, obj.author_id) not in seen:
+                    seen.add((obj.user_id, obj.author_id))
+                    new.append((pk, obj))
+            return new
+        if field is None:
+            return chunk
+        existing = dict(model.objects.filter(**{
+            f'{field}__in': [getattr(obj, field) for _, obj in chunk]
+        }).values_list(field, 'pk'))
+        new = []
+        for pk, obj in chunk:
+            if getattr(obj, field) in existing:
+                self.ids[model].add(pk, existing[getattr(obj, field)])
+            else:
+                new.append((pk, obj))
+        return new
+
+    def _flush(self, model, chunk):
+        for pk, obj in chunk:
+            self._resolve(pk, obj)
+            obj.pk = None
+        chunk = self._reuse_existing(model, chunk)
+        with transaction.atomic():
+            # raw: the dump's own dates are inserted as they are.
+            insert(model, [obj for _, obj in chunk], raw=True)
+        for pk, obj in chunk:
+            self.ids[model].add(pk, obj.pk)
+        self.counts[model] += len(chunk)
+        # With DEBUG the connection logs every insert with its values.
+        reset_queries()
+        self.progress(model, self.counts[model], sum(self.counts.values()),
+                      time.monotonic() - self.start)
+
+    def _records(self, stream):
+        for record in read_records(stream):
+            if record.get('model') in MODELS:
+                yield record
+            else:
+                self.skipped += 1
+
+    def run(self, stream):
+        # Every chunk is committed on its own, so the database isn't locked
+        # for the whole import. An interrupted import keeps the committed
+        # chunks, without counters and timelines for them.
+        self.start = time.monotonic()
+        model, chunk = None, []
+        for deserialized in Deserializer(
+                self._records(stream), ignorenonexistent=True):
+            obj = deserialized.object
+            if type(obj) is not model or len(chunk) >= self.chunk_size:
+                if chunk:
+                    self._flush(model, chunk)
+                model, chunk = type(obj), []
+            chunk.append((obj.pk, obj))
+        if chunk:
+            self._flush(model, chunk)
+        with transaction.atomic():
+            # Derived rows are cheaper to rebuild once than per chunk.
+            counters.reconcile()
+            timeline.rebuild()
+            graph.reload()
+            suggestions.mark_all_stale()
+            trending.rebuild()
+        return self.counts
@@ -1,5 +1,9 @@
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
+from PIL import Image
 
+from .images import process
 from .models import Post, Comment
 
 
@@ -8,6 +12,22 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # A new upload: the processed copy is what gets stored. The
+            # field only checks the header, decoding finds the rest.
+            try:
+                image, self.instance.image_width, \
+                    self.instance.image_height = process(image)
+            except (OSError, Image.DecompressionBombError):
+                raise ValidationError(
+                    self.fields['image'].error_messages['invalid_image'],
+                    code='invalid_image')
+        elif not image:
+            self.instance.image_width = self.instance.image_height = None
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
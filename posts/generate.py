@@ -0,0 +1,235 @@
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, reset_queries, router, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import counters, graph, search, suggestions, timeline, trending
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'дневник', 'утро', 'письмо', 'дорога', 'книга', 'война', 'мир', 'сад',
+    'музыка', 'работа', 'море', 'город', 'снег', 'весна', 'друг', 'дом',
+    'вечер', 'поезд', 'река', 'лес', 'история', 'память', 'окно', 'свет',
+    'and', 'the', 'и', 'в', 'на', 'что', 'не', 'как', 'было', 'сегодня',
+)
+
+IMAGE_VARIANTS = 8
+IMAGE_SIZE = (1280, 720)
+
+# Posts are spread over this period, ending at the start of today.
+PERIOD = timedelta(days=365)
+
+# Texts are slices of one long random text, joining words per row would
+# cost more than inserting it.
+CORPUS_WORDS = 100000
+
+
+def skewed(rng, n, exponent=3):
+    # 0 <= i < n, small i far more likely: with exponent 3 the first 1%
+    # of the range gets a fifth of all draws, like followers or activity
+    # of real users.
+    return int(n * rng.random() ** exponent)
+
+
+def _next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True)
+    return (last.first() or 0) + 1
+
+
+class Generator:
+    """Generates rows that only refer to each other, with explicit keys
+    after the existing ones, so it can also run on a filled database.
+
+    The same seed and sizes give the same rows (dates move with the
+    current day). Each model has its own random stream, changing the
+    number of comments doesn't change the posts.
+    """
+
+    def __init__(self, users, groups, posts, comments, follows, images=0.0,
+                 seed=0, chunk_size=10000, progress=None):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.images = images
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda *args: None)
+        # Dates are stored the way the sqlite backend stores them: naive
+        # UTC strings, seconds after the start of the period.
+        self.since = datetime.combine(
+            timezone.now().date(), datetime.min.time()) - PERIOD
+        self.period = int(PERIOD.total_seconds())
+        rng = random.Random(f'{seed}:text')
+        self.corpus = ' '.join(rng.choices(WORDS, k=CORPUS_WORDS))
+
+    def _random(self, model):
+        return random.Random(f'{self.seed}:{model._meta.label_lower}')
+
+    def _text(self, rng, length):
+        start = rng.randrange(len(self.corpus) - length)
+        return self.corpus[start:start + length].strip()
+
+    def _date(self, seconds):
+        return str(self.since + timedelta(seconds=seconds))
+
+    def _post_date(self, i):
+        # Seconds, posts go one after another by id.
+        return self.period * (i + 1) // self.posts
+
+    def _insert(self, model, fields, rows):
+        # Rows are tuples of database values for fields, the other
+        # columns get the field defaults. bulk_create() would build a
+        # model instance and prepare every value through its field,
+        # several times the cost of the insert itself.
+        using = router.db_for_write(model)
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        rest = [field for field in model._meta.concrete_fields
+                if field.attname not in fields]
+        defaults = tuple(field.get_db_prep_save(field.get_default(),
+                                                connection)
+                         for field in rest)
+        columns = [model._meta.get_field(name).column for name in fields]
+        columns += [field.column for field in rest]
+        sql = (f'INSERT INTO {quote(model._meta.db_table)} '
+               f'({", ".join(map(quote, columns))}) '
+               f'VALUES ({", ".join(["%s"] * len(columns))})')
+        start = time.monotonic()
+        count, chunk = 0, []
+        for row in rows:
+            chunk.append(row + defaults)
+            if len(chunk) >= self.chunk_size:
+                count += self._flush(using, sql, chunk)
+                self.progress(model, count, time.monotonic() - start)
+                chunk = []
+        if chunk:
+            count += self._flush(using, sql, chunk)
+            self.progress(model, count, time.monotonic() - start)
+
+    def _flush(self, using, sql, chunk):
+        with transaction.atomic(using), \
+                connections[using].cursor() as cursor:
+            cursor.executemany(sql, chunk)
+        # With DEBUG the connection logs every executemany().
+        reset_queries()
+        return len(chunk)
+
+    def _images(self, rng):
+        names = []
+        for i in range(IMAGE_VARIANTS):
+            image = Image.new('RGB', IMAGE_SIZE, tuple(
+                rng.randrange(256) for _ in range(3)))
+            content = io.BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            names.append(default_storage.save(
+                f'posts/generated_{i}.jpg', ContentFile(content.getvalue())))
+        return names
+
+    def generate_users(self):
+        first = self.user_pk = _next_pk(User)
+        joined = self._date(0)
+        password = make_password(None)
+        self._insert(
+            User, ('id', 'username', 'password', 'date_joined'),
+            ((pk, f'user{pk}', password, joined)
+             for pk in range(first, first + self.users)))
+
+    def generate_groups(self):
+        first = self.group_pk = _next_pk(Group)
+        rng = self._random(Group)
+        self._insert(
+            Group, ('id', 'title', 'slug', 'description'),
+            ((pk, f'Группа {pk}', f'group-{pk}', self._text(rng, 200))
+             for pk in range(first, first + self.groups)))
+
+    def generate_posts(self):
+        first = self.post_pk = _next_pk(Post)
+        rng = self._random(Post)
+        images = self._images(rng) if self.images else []
+
+        def rows():
+            for i in range(self.posts):
+                # A few authors write most posts, a few groups get most
+                # of them, a third of the posts are in no group.
+                group = None
+                if self.groups and rng.random() > 1 / 3:
+                    group = self.group_pk + skewed(rng, self.groups)
+                image = None
+                if images and rng.random() < self.images:
+                    image = rng.choice(images)
+                yield (first + i, self.user_pk + skewed(rng, self.users),
+                       group, self._date(self._post_date(i)),
+                       self._text(rng, 40 + skewed(rng, 2000, 2)), image,
+                       *(IMAGE_SIZE if image else (None, None)))
+
+        self._insert(
+            Post, ('id', 'author_id', 'group_id', 'pub_date', 'text',
+                   'image', 'image_width', 'image_height'),
+            rows())
+
+    def generate_comments(self):
+        first = _next_pk(Comment)
+        rng = self._random(Comment)
+        month = 3600 * 24 * 30
+
+        def rows():
+            for pk in range(first, first + self.comments):
+                # Recent posts are discussed most.
+                i = self.posts - 1 - skewed(rng, self.posts)
+                created = min(self._post_date(i) + skewed(rng, month),
+                              self.period)
+                yield (pk, self.post_pk + i,
+                       self.user_pk + rng.randrange(self.users),
+                       self._date(created), self._text(rng, 10 + skewed(
+                           rng, 300)))
+
+        self._insert(
+            Comment, ('id', 'post_id', 'author_id', 'created', 'text'),
+            rows())
+
+    def generate_follows(self):
+        rng = self._random(Follow)
+        # Followers per author follow a power law too, but the most
+        # followed aren't the most prolific: with both rankings equal
+        # every timeline would be filled with the same few authors.
+        popular = list(range(self.users))
+        rng.shuffle(popular)
+
+        def rows():
+            for i in range(self.users):
+                count = min(int(rng.expovariate(1 / self.follows)),
+                            self.users - 1)
+                authors = {popular[skewed(rng, self.users)]
+                           for _ in range(count)}
+                authors.discard(i)
+                for author in sorted(authors):
+                    yield self.user_pk + i, self.user_pk + author
+
+        self._insert(Follow, ('user_id', 'author_id'), rows())
+
+    def run(self, timelines=True):
+        self.generate_users()
+        self.generate_groups()
+        if self.users:
+            with search.deferred():
+                self.generate_posts()
+            if self.posts:
+                self.generate_comments()
+            if self.follows:
+                self.generate_follows()
+        with transaction.atomic():
+            counters.reconcile()
+            graph.reload()
+            suggestions.mark_all_stale()
+            trending.rebuild()
+            if timelines:
+                timeline.rebuild()
@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import Follow
+
+# Changes are published to all processes through a log in the shared
+# cache: SEQ_KEY counts them, each one is stored under log_key(seq).
+SEQ_KEY = 'follow_graph:seq'
+LOG_TIMEOUT = 600
+# A process further behind than this reloads instead of replaying.
+MAX_REPLAY = 10000
+# _publish() takes the seq before it stores the change. A change missing
+# for longer than this was evicted, or its process died in between.
+GAP_TIMEOUT = 5
+
+RELOAD = 'reload'
+
+_lock = threading.RLock()
+_local = threading.local()
+_graph = None
+
+
+def log_key(seq):
+    return f'follow_graph:{seq}'
+
+
+class Adjacency:
+    """Sorted neighbour ids of every node in two arrays (CSR).
+
+    The neighbours of node n are targets[offsets[n]:offsets[n + 1]], four
+    bytes per edge plus eight per node id. Changes since the arrays were
+    built are kept in sets on top of them and merged in once there are
+    more than a twentieth as many as edges.
+    """
+
+    def __init__(self, sources=(), targets=(), size=0):
+        # sources, targets: edges ordered by target within each source.
+        counts = array('q', bytes(8 * (size + 1)))
+        for source in sources:
+            counts[source + 1] += 1
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        self.offsets = counts
+        self.targets = array('i', bytes(4 * len(targets)))
+        position = array('q', counts)
+        for source, target in zip(sources, targets):
+            self.targets[position[source]] = target
+            position[source] += 1
+        self.added = {}
+        self.removed = {}
+        self.changes = 0
+
+    def _base(self, node):
+        if node + 1 >= len(self.offsets):
+            return 0, 0
+        return self.offsets[node], self.offsets[node + 1]
+
+    def _in_base(self, node, target):
+        lo, hi = self._base(node)
+        i = bisect_left(self.targets, target, lo, hi)
+        return i < hi and self.targets[i] == target
+
+    def __contains__(self, edge):
+        node, target = edge
+        if target in self.added.get(node, ()):
+            return True
+        if target in self.removed.get(node, ()):
+            return False
+        return self._in_base(node, target)
+
+    def count(self, node):
+        lo, hi = self._base(node)
+        return (hi - lo + len(self.added.get(node, ()))
+                - len(self.removed.get(node, ())))
+
+    def neighbours(self, node):
+        lo, hi = self._base(node)
+        removed = self.removed.get(node, ())
+        result = [target for target in self.targets[lo:hi]
+                  if target not in removed]
+        added = self.added.get(node)
+        if added:
+            result = sorted(result + list(added))
+        return result
+
+    def _change(self, changes, node, target):
+        changes.setdefault(node, set()).add(target)
+        self.changes += 1
+
+    def _undo(self, changes, node, target):
+        targets = changes[node]
+        targets.discard(target)
+        if not targets:
+            del changes[node]
+        self.changes -= 1
+
+    def add(self, node, target):
+        if target in self.removed.get(node, ()):
+            self._undo(self.removed, node, target)
+        elif not self._in_base(node, target):
+            self._change(self.added, node, target)
+        self._maybe_compact()
+
+    def remove(self, node, target):
+        if target in self.added.get(node, ()):
+            self._undo(self.added, node, target)
+        elif self._in_base(node, target):
+            self._change(self.removed, node, target)
+        self._maybe_compact()
+
+    def edges(self):
+        nodes = set(self.added)
+        nodes.update(range(len(self.offsets) - 1))
+        for node in sorted(nodes):
+            for target in self.neighbours(node):
+                yield node, target
+
+    def _maybe_compact(self):
+        if self.changes > max(1000, len(self.targets) // 20):
+            sources, targets = array('i'), array('i')
+            for source, target in self.edges():
+                sources.append(source)
+                targets.append(target)
+            self.__init__(sources, targets, max(sources, default=-1) + 1)
+
+
+class FollowGraph:
+    """Who follows whom: is_following() is a set lookup or a binary
+    search, counts and lists don't touch the database."""
+
+    def __init__(self, users=(), authors=()):
+        # users, authors: follows ordered by user, then author.
+        size = max(max(users, default=-1), max(authors, default=-1)) + 1
+        self.following = Adjacency(users, authors, size)
+        self.followers = Adjacency(authors, users, size)
+        self.seq = 0
+        self.pid = os.getpid()
+        # (seq, monotonic time) of the first change found missing.
+        self.gap = None
+
+    @classmethod
+    def load(cls):
+        users, authors = array('i'), array('i')
+        # The primary: a replica behind it would leave the graph stale
+        # until the next change of the follows.
+        follows = Follow.objects.using(router.db_for_write(Follow)).order_by(
+            'user_id', 'author_id').values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator(chunk_size=10000):
+            users.append(user_id)
+            authors.append(author_id)
+        return cls(users, authors)
+
+    def is_following(self, user_id, author_id):
+        return (user_id, author_id) in self.following
+
+    def following_ids(self, user_id):
+        return self.following.neighbours(user_id)
+
+    def follower_ids(self, author_id):
+        return self.followers.neighbours(author_id)
+
+    def following_count(self, user_id):
+        return self.following.count(user_id)
+
+    def followers_count(self, author_id):
+        return self.followers.count(author_id)
+
+    def apply(self, change):
+        added, user_id, author_id = change
+        if added:
+            self.following.add(user_id, author_id)
+            self.followers.add(author_id, user_id)
+        else:
+            self.following.remove(user_id, author_id)
+            self.followers.remove(author_id, user_id)
+
+
+def _publish(change):
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        cache.add(SEQ_KEY, 0, None)
+        seq = cache.incr(SEQ_KEY)
+    cache.set(log_key(seq), change, LOG_TIMEOUT)
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = []
+    return _local.pending
+
+
+def _settle():
+    # Changes are applied here at once and published on commit; those
+    # still pending outside a transaction were rolled back.
+    pending = _pending()
+    using = router.db_for_write(Follow)
+    if pending and not transaction.get_connection(using).in_atomic_block:
+        for graph, (added, user_id, author_id) in reversed(pending):
+            # A graph loaded since then never had the change.
+            if graph is _graph:
+                graph.apply((not added, user_id, author_id))
+        pending.clear()
+
+
+def _replay(graph, seq):
+    if seq - graph.seq > MAX_REPLAY:
+        return False
+    keys = [log_key(n) for n in range(graph.seq + 1, seq + 1)]
+    changes = cache.get_many(keys)
+    for n, key in enumerate(keys, graph.seq + 1):
+        if key not in changes:
+            # Applied up to the gap, the rest waits for the next call.
+            now = time.monotonic()
+            if graph.gap is None or graph.gap[0] != n:
+                graph.gap = (n, now)
+            return now - graph.gap[1] < GAP_TIMEOUT
+        if changes[key] == RELOAD:
+            return False
+        graph.apply(changes[key])
+        graph.seq = n
+    graph.gap = None
+    return True
+
+
+def get_graph():
+    """The follow graph of this process, up to date with changes
+    committed by all processes."""
+    global _graph
+    with _lock:
+        seq = cache.get(SEQ_KEY)
+        if seq is None:
+            # First start or the cache was cleared: the log is lost.
+            cache.add(SEQ_KEY, 0, None)
+            seq = cache.get(SEQ_KEY, 0)
+            stale = True
+        else:
+            stale = (_graph is None or _graph.pid != os.getpid()
+                     or seq < _graph.seq)
+        if stale or (seq > _graph.seq and not _replay(_graph, seq)):
+            _graph = FollowGraph.load()
+            _graph.seq = seq
+        _settle()
+        return _graph
+
+
+def _change(added, follows):
+    graph = get_graph()
+    pending = _pending()
+    for follow in follows:
+        change = (added, follow.user_id, follow.author_id)
+        with _lock:
+            graph.apply(change)
+        pending.append((graph, change))
+
+        def committed(entry=pending[-1]):
+            if entry in pending:
+                pending.remove(entry)
+            _publish(entry[1])
+
+        transaction.on_commit(committed, using=router.db_for_write(Follow))
+
+
+def followed(*follows):
+    _change(True, follows)
+
+
+def unfollowed(*follows):
+    _change(False, follows)
+
+
+def reload(using=None):
+    # After writes that bypass the signals: this process reloads at once
+    # (seeing the transaction's own rows), the others after the commit.
+    global _graph
+    with _lock:
+        _graph = None
+    transaction.on_commit(lambda: _publish(RELOAD),
+                          using=using or router.db_for_write(Follow))
@@ -0,0 +1,55 @@
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def process(upload):
+    """Downscale and re-encode an uploaded image without its metadata.
+
+    Returns (file, width, height). Pillow reads the upload lazily from its
+    file, on disk for anything above FILE_UPLOAD_MAX_MEMORY_SIZE, and
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale when that still
+    covers POST_IMAGE_MAX_SIZE, so a full-size bitmap of a large photo is
+    never built. The result spills to disk past the same size.
+    """
+    size = settings.POST_IMAGE_MAX_SIZE
+    image_format = settings.POST_IMAGE_FORMAT
+    upload.seek(0)
+    image = Image.open(upload)
+    scale = size / max(image.size)
+    if scale < 1:
+        image.draft('RGB', (round(image.width * scale),
+                            round(image.height * scale)))
+    # The color profile stays, the rest of the metadata (EXIF with the
+    # camera, time and location) is not written back.
+    icc_profile = image.info.get('icc_profile')
+    if image.mode not in ('RGB', 'RGBA'):
+        icc_profile = None
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+    # Phones store rotated photos with an EXIF orientation.
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+
+    options = {'quality': settings.POST_IMAGE_QUALITY}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    image.save(output, image_format, **options)
+    output.seek(0)
+    name = f'{Path(upload.name).stem}.{EXTENSIONS[image_format]}'
+    return File(output, name), image.width, image.height
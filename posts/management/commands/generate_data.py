@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.generate import Generator
+
+
+class Command(BaseCommand):
+    help = ('Generate users, groups, posts, comments and follows with '
+            'skewed activity, deterministic for a seed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Average follows per user (default 20)')
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Share of posts with an image, 0..1 (default 0)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Rows per transaction (default 10000)')
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help="Don't rebuild follow timelines (run rebuild_timelines "
+                 "later)")
+
+    def progress(self, model, count, elapsed):
+        self.stdout.write(
+            f'{model._meta.label_lower}: {count} rows in {elapsed:.1f}s '
+            f'({count / max(elapsed, 1e-6):.0f} rows/s)')
+
+    def handle(self, *args, **options):
+        if min(options[name] for name in (
+                'users', 'groups', 'posts', 'comments', 'follows')) < 0:
+            raise CommandError('Row counts must not be negative')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images must be between 0 and 1')
+        start = time.monotonic()
+        Generator(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'], options['images'],
+            options['seed'], options['chunk_size'], self.progress,
+        ).run(timelines=not options['no_timelines'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Data generated in {time.monotonic() - start:.1f}s'))
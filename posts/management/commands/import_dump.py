@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+
+from posts.dump import Importer, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Stream a dumpdata JSON (or JSON lines, .gz) file of users, '
+            'groups, posts, comments and follows into the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows per bulk insert (default 1000)')
+
+    def progress(self, model, count, total, elapsed):
+        self.stdout.write(
+            f'{model._meta.label_lower}: {count}, {total} rows in '
+            f'{elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f} rows/s)')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['chunk_size'], self.progress)
+        try:
+            with open_dump(options['path']) as stream:
+                counts = importer.run(stream)
+        except (OSError, ValueError, DeserializationError) as error:
+            raise CommandError(error)
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows, skipped {importer.skipped} records '
+            f'of other models'))
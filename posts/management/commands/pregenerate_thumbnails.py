@@ -0,0 +1,33 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Generate missing feed thumbnails for post images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            help='Worker processes (all cores by default)')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True).distinct()
+        names = [name for name in names.iterator()
+                 if thumbnails.feed_thumbnail(name) is None]
+
+        start = time.monotonic()
+        pool = thumbnails.get_pool(options['workers'] or os.cpu_count())
+        for done, name in enumerate(
+                pool.map(thumbnails.generate, names, chunksize=16), 1):
+            if done % 100 == 0 or done == len(names):
+                self.stdout.write(f'{done}/{len(names)} {name}')
+        pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(names)} thumbnails generated in '
+            f'{time.monotonic() - start:.1f}s'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized follow timelines from Follow and Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Rebuild only these users (all users by default)')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        with transaction.atomic():
+            count = timeline.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Timelines rebuilt from {count} follows'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Drop expired activity buckets and recompute trending posts, '
+            'groups and authors')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recount post and comment buckets from the tables first')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = trending.rebuild()
+        else:
+            count = trending.rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Trending scores updated for {count} objects'))
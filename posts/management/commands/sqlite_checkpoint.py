@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Copy the SQLite write-ahead log into the database file; '
+            'with --every, keep doing it, e.g. next to gunicorn')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--mode', default='truncate',
+            choices=['passive', 'full', 'restart', 'truncate'],
+            help='wal_checkpoint mode (default truncate)')
+        parser.add_argument(
+            '--every', type=float,
+            help='Repeat every this many seconds')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'{options["database"]} is not SQLite')
+        mode = options['mode'].upper()
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+                busy, log, done = cursor.fetchone()
+            connection.close()
+            self.stdout.write(
+                f'{mode}: {done} of {log} WAL pages checkpointed'
+                + (', blocked by readers' if busy else ''))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Recompute follow suggestions of users whose follows or '
+            'comments changed')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute suggestions of every user')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Users per transaction (default 500)')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            suggestions.mark_all_stale()
+        count = suggestions.update(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Suggestions updated for {count} users'))
@@ -30,13 +30,38 @@ class Post(models.Model):
         related_name='group_posts'
     )
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Set by PostForm when an upload is processed, see posts.images.
+    image_width = models.PositiveIntegerField(
+        blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        blank=True, null=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['pub_date', 'id']),
+            models.Index(fields=['group', 'pub_date', 'id']),
+            models.Index(fields=['author', 'pub_date', 'id']),
+        ]
 
     def __str__(self):
         return f'Post {self.pk}/{self.author}/{self.pub_date}'
 
+    def save(self, *args, **kwargs):
+        # comment_count and version are maintained with F() updates, a stale
+        # in-memory copy must not overwrite them when the post is edited.
+        if self._state.adding or kwargs.get('update_fields') is not None:
+            return super().save(*args, **kwargs)
+        self.version = models.F('version') + 1
+        kwargs['update_fields'] = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name != 'comment_count'
+        ]
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -68,3 +93,117 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'follow {self.user} - {self.author}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    pub_date = models.DateTimeField('date published')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post']),
+        ]
+
+    def __str__(self):
+        return f'timeline {self.user} - {self.post}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='stats')
+    post_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'stats {self.user}'
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='suggestions')
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='suggested_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'rank']),
+        ]
+
+    def __str__(self):
+        return f'suggestion {self.user} - {self.author}'
+
+
+class StaleSuggestions(models.Model):
+    # Not a foreign key: users are queued from the delete signals of
+    # their own follows and comments too.
+    user_id = models.IntegerField(primary_key=True)
+    # Bumped when the user is queued again, while update() computes.
+    version = models.PositiveIntegerField(default=0)
+    # The user's follows changed: its followers are recomputed too.
+    follows_changed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'stale suggestions {self.user_id}'
+
+
+class ActivityBucket(models.Model):
+    GROUP_POSTS = 1
+    POST_COMMENTS = 2
+    AUTHOR_FOLLOWS = 3
+    KINDS = [
+        (GROUP_POSTS, 'new posts in a group'),
+        (POST_COMMENTS, 'comments on a post'),
+        (AUTHOR_FOLLOWS, 'new followers of an author'),
+    ]
+
+    kind = models.PositiveSmallIntegerField(choices=KINDS)
+    # A group, post or user id, depending on kind.
+    object_id = models.IntegerField()
+    hour = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'hour'], name='unique_bucket')
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f'bucket {self.kind}/{self.object_id}/{self.hour}'
+
+
+class Trend(models.Model):
+    kind = models.PositiveSmallIntegerField(choices=ActivityBucket.KINDS)
+    object_id = models.IntegerField()
+    score = models.FloatField()
+    count = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='unique_trend')
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-score']),
+        ]
+
+    def __str__(self):
+        return f'trend {self.kind}/{self.object_id}'
@@ -0,0 +1,103 @@
+from collections.abc import Sequence
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class CursorPage(Sequence):
+    # next_cursor points to older posts, previous_cursor to newer ones.
+    def __init__(self, object_list, paginator, number=1,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator:
+    # Keyset pagination over (date_field, pk_field): every page is a range
+    # scan of an index on both fields, without OFFSET and COUNT. where is
+    # applied in the same filter() as the range: when date_field is on a
+    # multi-valued relation, separate calls would join it twice.
+    def __init__(self, object_list, per_page,
+                 date_field='pub_date', pk_field='id', where=Q()):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.where = where
+
+    def _value(self, obj, field):
+        # obj: a model instance or a values() row.
+        name = field.rsplit('__', 1)[-1]
+        return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+    def encode_cursor(self, obj):
+        date = self._value(obj, self.date_field)
+        pk = self._value(obj, self.pk_field)
+        return urlsafe_base64_encode(f'{date.isoformat()}|{pk}'.encode())
+
+    def decode_cursor(self, cursor):
+        try:
+            date, pk = urlsafe_base64_decode(cursor).decode().split('|')
+            date, pk = parse_datetime(date), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            date = None
+        if date is None:
+            raise Http404('Invalid cursor')
+        return date, pk
+
+    def _range(self, cursor, op):
+        date, pk = self.decode_cursor(cursor)
+        return self.where & (
+            Q(**{f'{self.date_field}__{op}': date})
+            | Q(**{self.date_field: date, f'{self.pk_field}__{op}': pk})
+        )
+
+    def page(self, before=None, after=None):
+        limit = self.per_page + 1
+        if after:
+            items = list(self.object_list.filter(
+                self._range(after, 'gt')).order_by(
+                    self.date_field, self.pk_field)[:limit])
+            has_newer = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            has_older = True
+            number = f'after:{after}'
+        else:
+            queryset = self.object_list.filter(
+                self._range(before, 'lt') if before else self.where)
+            items = list(queryset.order_by(
+                f'-{self.date_field}', f'-{self.pk_field}')[:limit])
+            has_older = len(items) > self.per_page
+            items = items[:self.per_page]
+            has_newer = bool(before)
+            number = f'before:{before}' if before else 1
+
+        next_cursor = previous_cursor = None
+        if items and has_older:
+            next_cursor = self.encode_cursor(items[-1])
+        if items and has_newer:
+            previous_cursor = self.encode_cursor(items[0])
+        return CursorPage(items, self, number, next_cursor, previous_cursor)
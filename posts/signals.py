@@ -0,0 +1,146 @@
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    cards, counters, graph, search, suggestions, thumbnails, timeline,
+    trending)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.user_added(instance)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def card_owner_saving(sender, instance, using, raw=False, update_fields=None,
+                      **kwargs):
+    instance._cards_changed = not raw and cards.shown_fields_changed(
+        instance, using, update_fields)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def card_owner_saved(sender, instance, using, **kwargs):
+    if getattr(instance, '_cards_changed', False):
+        cards.expire(instance, using)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.post_added(instance)
+        timeline.fan_out(instance)
+        trending.record(trending.GROUP_POSTS,
+                        [(instance.group_id, instance.pub_date, 1)])
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if thumbnails.feed_thumbnail(instance.image) is None:
+        name = instance.image.name
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+# Posts and users being deleted in this thread: their comments are
+# accounted for at once before the cascade, not one at a time.
+_local = threading.local()
+
+
+def _deleting():
+    if not hasattr(_local, 'posts'):
+        _local.posts, _local.users = set(), set()
+    return _local
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting().posts.add(instance.pk)
+    suggestions.posts_commented([instance.pk])
+    trending.forget(trending.POST_COMMENTS, [instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting().posts.discard(instance.pk)
+    counters.post_added(instance, -1)
+    trending.record(trending.GROUP_POSTS,
+                    [(instance.group_id, instance.pub_date, -1)])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # Comments on the user's own posts go with the posts.
+    _deleting().users.add(instance.pk)
+    comments = Comment.objects.filter(author=instance).exclude(
+        post__author=instance)
+    counters.comments_deleted(comments)
+    suggestions.posts_commented(comments.values('post_id'))
+    trending.comments_deleted(comments)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _deleting().users.discard(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance)
+        suggestions.comments_changed([instance])
+        trending.record(trending.POST_COMMENTS,
+                        [(instance.post_id, instance.created, 1)])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    deleting = _deleting()
+    if (instance.post_id in deleting.posts
+            or instance.author_id in deleting.users):
+        return
+    counters.comment_added(instance, -1)
+    suggestions.comments_changed([instance])
+    trending.record(trending.POST_COMMENTS,
+                    [(instance.post_id, instance.created, -1)])
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created:
+        graph.followed(instance)
+    if created and not raw:
+        counters.follow_added(instance)
+        timeline.backfill(instance.user_id, instance.author_id)
+        suggestions.follows_changed([instance])
+        trending.record(trending.AUTHOR_FOLLOWS,
+                        [(instance.author_id, timezone.now(), 1)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    graph.unfollowed(instance)
+    counters.follow_added(instance, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    suggestions.follows_changed([instance])
+    trending.record(trending.AUTHOR_FOLLOWS,
+                    [(instance.author_id, timezone.now(), -1)])
+
+
+def install_search_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if router.allow_migrate_model(using, Post):
+        search.install(using)
+
+
+def reload_follow_graph(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # flush replaces follows without signals.
+    graph.reload(using)
@@ -0,0 +1,191 @@
+import heapq
+import math
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .graph import get_graph
+from .models import Comment, Post, StaleSuggestions, Suggestion, User
+
+# A comment next to someone's counts half as much as following the same
+# author. Posts with more commenters than COMMENTERS_LIMIT link nobody in
+# particular and are skipped.
+FOLLOW_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+COMMENTERS_LIMIT = 500
+
+
+def _weight(degree):
+    # Adamic-Adar: a path through someone who follows everybody, or a
+    # post everybody commented, says little about either end.
+    return 1 / math.log(2 + degree)
+
+
+def mark_stale(users, follows_changed=False):
+    # users: a values_list('pk') style queryset, copied into the queue by
+    # the database with INSERT ... SELECT; users already queued get a new
+    # version instead.
+    using = router.db_for_write(StaleSuggestions)
+    connection = connections[using]
+    sql, params = users.query.get_compiler(using).as_sql()
+    quote = connection.ops.quote_name
+    table = quote(StaleSuggestions._meta.db_table)
+    version, flag = quote('version'), quote('follows_changed')
+    update = f'{version} = {version} + 1'
+    if follows_changed:
+        update += f', {flag} = %s'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {update} '
+            f'WHERE {quote("user_id")} IN ({sql})',
+            (True, *params) if follows_changed else params)
+        cursor.execute(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{table} ({quote("user_id")}, {version}, {flag}) '
+            f'SELECT {quote("users")}.*, 0, %s FROM ({sql}) {quote("users")} '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}',
+            (follows_changed, *params))
+
+
+def follows_changed(follows):
+    # Only the followers: update() recomputes their own followers too, so
+    # a follow costs the same whatever the follower's audience.
+    user_ids = {follow.user_id for follow in follows}
+    if user_ids:
+        mark_stale(User.objects.filter(pk__in=user_ids).values_list('pk'),
+                   follows_changed=True)
+
+
+def comments_changed(comments):
+    if comments:
+        posts_commented({comment.post_id for comment in comments},
+                        {comment.author_id for comment in comments})
+
+
+def posts_commented(post_ids, author_ids=()):
+    # The commenters and everyone else who commented the same posts,
+    # unless a post has too many comments for _co_commenters to count it.
+    # post_ids may be a values('pk') queryset.
+    posts = Post.objects.filter(
+        pk__in=post_ids, comment_count__lte=COMMENTERS_LIMIT)
+    mark_stale(Comment.objects.filter(
+        post__in=posts
+    ).order_by().values_list('author_id').union(User.objects.filter(
+        pk__in=author_ids).values_list('pk')))
+
+
+def mark_all_stale():
+    mark_stale(User.objects.values_list('pk'))
+
+
+def _co_commenters(user_ids):
+    posts = Comment.objects.filter(author_id__in=user_ids).values('post_id')
+    rows = Comment.objects.filter(post_id__in=posts).order_by().values_list(
+        'post_id', 'author_id').distinct()
+    commenters = defaultdict(set)
+    for post_id, author_id in rows.iterator():
+        commenters[post_id].add(author_id)
+    wanted = set(user_ids)
+    scores = defaultdict(lambda: defaultdict(float))
+    for authors in commenters.values():
+        if len(authors) > COMMENTERS_LIMIT:
+            continue
+        weight = COMMENT_WEIGHT * _weight(len(authors))
+        for user_id in authors & wanted:
+            for author_id in authors:
+                scores[user_id][author_id] += weight
+    return scores
+
+
+def suggest(user_ids, graph):
+    """Top SUGGESTIONS_SIZE (author_id, score) pairs for each user, from
+    authors followed by the authors they follow and from the people who
+    commented the same posts."""
+    co_commenters = _co_commenters(user_ids)
+    result = {}
+    for user_id in user_ids:
+        following = graph.following_ids(user_id)
+        scores = co_commenters.get(user_id, defaultdict(float))
+        for via in following:
+            candidates = graph.following_ids(via)
+            weight = FOLLOW_WEIGHT * _weight(len(candidates))
+            for author_id in candidates:
+                scores[author_id] += weight
+        for author_id in [user_id, *following]:
+            scores.pop(author_id, None)
+        best = heapq.nlargest(
+            settings.SUGGESTIONS_SIZE, scores.items(), key=itemgetter(1))
+        result[user_id] = [
+            (author_id, round(score, 4)) for author_id, score in best]
+    return result
+
+
+def _compute(user_ids, graph):
+    return suggest(list(User.objects.filter(
+        pk__in=user_ids).values_list('pk', flat=True)), graph)
+
+
+def _store(suggestions):
+    Suggestion.objects.filter(user_id__in=suggestions).delete()
+    Suggestion.objects.bulk_create(
+        Suggestion(user_id=user_id, author_id=author_id,
+                   rank=rank, score=score)
+        for user_id, authors in suggestions.items()
+        for rank, (author_id, score) in enumerate(authors))
+
+
+def update(chunk_size=500):
+    """Recompute suggestions of the queued users, and of the followers
+    of those whose follows changed, chunk_size at a time.
+
+    Suggestions are computed outside of a transaction. A user leaves the
+    queue with the new suggestions only if it wasn't queued again
+    meanwhile, otherwise it stays for the next run.
+    """
+    updated = 0
+    last = -1
+    while True:
+        queued = list(StaleSuggestions.objects.filter(
+            user_id__gt=last).order_by('user_id').values_list(
+                'user_id', 'version', 'follows_changed')[:chunk_size])
+        if not queued:
+            return updated
+        last = queued[-1][0]
+        graph = get_graph()
+        queued_ids = [user_id for user_id, _, _ in queued]
+        followers = sorted({
+            follower for user_id, _, changed in queued if changed
+            for follower in graph.follower_ids(user_id)
+        }.difference(queued_ids))
+        for start in range(0, len(followers), chunk_size):
+            suggestions = _compute(followers[start:start + chunk_size], graph)
+            with transaction.atomic(using=router.db_for_write(Suggestion)):
+                _store(suggestions)
+            updated += len(suggestions)
+
+        suggestions = _compute(queued_ids, graph)
+        versions = defaultdict(list)
+        for user_id, version, _ in queued:
+            versions[version].append(user_id)
+        with transaction.atomic(
+                using=router.db_for_write(StaleSuggestions)):
+            for version, ids in versions.items():
+                StaleSuggestions.objects.filter(
+                    user_id__in=ids, version=version).delete()
+            _store(suggestions)
+        updated += len(suggestions)
+
+
+def suggestions_for(user):
+    # One query; authors followed since the last update() are dropped
+    # with the follow graph.
+    if not user.is_authenticated:
+        return []
+    graph = get_graph()
+    return [
+        suggestion for suggestion in Suggestion.objects.filter(
+            user=user).select_related('author').order_by('rank')
+        if not graph.is_following(user.pk, suggestion.author_id)
+    ]
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, from_post=False):
+    return mark_safe(''.join(
+        render_cards(list(posts), context['request'], from_post)))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, from_post=False):
+    return mark_safe(render_cards([post], context['request'], from_post)[0])
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import post_thumbnail
+
+register = template.Library()
+
+
+@register.filter
+def ready_thumbnail(post):
+    return post_thumbnail(post)
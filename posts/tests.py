@@ -1,15 +1,28 @@
+import json
+from concurrent.futures import Future
+from io import BytesIO, StringIO
 from tempfile import NamedTemporaryFile
+from unittest import mock
 from uuid import uuid1
 from pathlib import Path
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.conf import settings
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 from PIL import Image
 from sorl.thumbnail import delete
 
-from .models import Post, User
+from . import cards, counters, graph, search, suggestions, thumbnails, trending
+from .dump import READ_SIZE, read_records
+from .models import (
+    ActivityBucket, Comment, Follow, Group, Post, StaleSuggestions, Suggestion,
+    TimelineEntry, Trend, User, UserStats)
 
 
 class Test(TestCase):
@@ -77,6 +90,7 @@ class Test(TestCase):
             self.assertNotContains(response, post.text, msg_prefix='На странице ленты подписок отображается пост подписанного автора')
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(
             username='test_user', email='test@example.com', password='test_password')
@@ -176,23 +190,54 @@ class Test(TestCase):
 
     def test_cache(self):
         self.client.force_login(self.user)
-
-        response = self.client.get('/')
+        post = Post.objects.create(text=str(uuid1()), author=self.user)
+        self.client.get('/')
 
         test_text = str(uuid1())
         new_post = Post.objects.create(text=test_text, author=self.user)
-        new_post.save()
+        response = self.client.get('/')
+        self.assertContains(
+            response, test_text, msg_prefix='На главной странице не появился новый пост')
+
+        cached_text = post.text
+        Post.objects.filter(pk=post.pk).update(text=str(uuid1()))
+        response = self.client.get('/')
+        self.assertContains(
+            response, cached_text, msg_prefix='Карточка записи не кэшируется')
 
+        post.refresh_from_db()
+        post.save()
+        Comment.objects.create(post=new_post, author=self.user, text='test')
+        response = self.client.get('/')
+        self.assertContains(
+            response, post.text, msg_prefix='Кэш карточки не сбрасывается при редактировании')
+        self.assertContains(
+            response, '1 комментариев', msg_prefix='Кэш карточки не сбрасывается при комментировании')
+
+        self.client.logout()
         response = self.client.get('/')
         self.assertNotContains(
-            response, test_text, msg_prefix='На главной странице не работает кэширование')
+            response, 'Редактировать', msg_prefix='Закэшированная ссылка редактирования видна другому пользователю')
 
-        key = make_template_fragment_key('index_page', [1])
-        cache.delete(key)
+    def test_cache_author_and_group_changes(self):
+        group = Group.objects.create(title='old title', slug='old-slug')
+        post = Post.objects.create(text='test', author=self.user, group=group)
+        self.client.get('/')
 
+        self.user.username = 'new_username'
+        self.user.save()
+        group.title = 'new title'
+        group.save()
         response = self.client.get('/')
-        self.assertContains(
-            response, test_text, msg_prefix='На главной странице не появился новый пост после очистки кэша')
+        self.assertContains(response, '@new_username',
+                            msg_prefix='Кэш карточки не сбрасывается при смене имени автора')
+        self.assertContains(response, '#new title',
+                            msg_prefix='Кэш карточки не сбрасывается при смене названия группы')
+
+        version = Post.objects.get(pk=post.pk).version
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(Post.objects.get(pk=post.pk).version, version,
+                         msg='Версия записи меняется без изменения автора')
 
     def test_follow(self):
         post = self.create_user_post()
@@ -210,6 +255,23 @@ class Test(TestCase):
         self.client.get(f'/{post.author.username}/unfollow/')
         self.post_follow_check(post, False)
 
+    def test_post_page_queries(self):
+        post = self.create_user_post()
+        url = f'/{post.author.username}/{post.id}/'
+
+        def page_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            return len(queries)
+
+        Comment.objects.create(post=post, author=self.user, text='test')
+        expected = page_queries()
+        for _ in range(5):
+            Comment.objects.create(post=post, author=self.user, text='test')
+        self.assertEqual(page_queries(), expected,
+                         msg='Число запросов страницы записи растет с числом комментариев')
+
     def test_comment(self):
         post = self.create_user_post()
 
@@ -221,3 +283,565 @@ class Test(TestCase):
         self.client.post(f'/{post.author.username}/{post.id}/comment/', {'text': comment_text})
         response = self.client.get(f'/{post.author.username}/{post.id}/')
         self.assertContains(response, comment_text, msg_prefix='Отправленный авторизованным пользователем комментарий не отображается на странице просмотра записи')
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_pagination(self):
+        posts = [Post.objects.create(text=str(uuid1()), author=self.user)
+                 for _ in range(25)]
+        # Одинаковое время публикации у части записей проверяет
+        # упорядочивание по id внутри одной даты.
+        Post.objects.filter(id__in=[p.id for p in posts[5:15]]).update(
+            pub_date=timezone.now())
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+        cache.clear()
+        seen, pages, params = [], [], {}
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/', params)
+            self.assertFalse(
+                any('__count' in q['sql'] for q in queries.captured_queries),
+                msg='Курсорная пагинация выполняет запрос COUNT')
+            page = response.context['page_obj']
+            pages.append(page)
+            seen.extend(page.object_list)
+            if not page.has_next():
+                break
+            params = {'before': page.next_cursor}
+        self.assertEqual(seen, expected,
+                         msg='Курсорная пагинация пропускает или повторяет записи')
+        self.assertEqual(len(pages), 3)
+        self.assertContains(response, '?after=')
+
+        response = self.client.get('/', {'after': pages[-1].previous_cursor})
+        self.assertEqual(list(response.context['page_obj']), pages[1].object_list,
+                         msg='Ссылка на более новые записи ведет на неверную страницу')
+
+        response = self.client.get('/', {'before': 'broken'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_follow_cursor_pagination(self):
+        author = self.create_user_post().author
+        for _ in range(24):
+            Post.objects.create(text=str(uuid1()), author=author)
+        for username in ('follower_1', 'follower_2', 'follower_3'):
+            Follow.objects.create(user=User.objects.create_user(username=username), author=author)
+        Follow.objects.create(user=self.user, author=author)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+        self.client.force_login(self.user)
+        seen, params = [], {}
+        while True:
+            page = self.client.get('/follow/', params).context['page_obj']
+            seen.extend(page.object_list)
+            if not page.has_next():
+                break
+            params = {'before': page.next_cursor}
+        self.assertEqual(seen, expected,
+                         msg='Курсорная пагинация ленты подписок пропускает или повторяет записи')
+
+    def test_follow_timeline(self):
+        old_post = self.create_user_post()
+        author = old_post.author
+        Follow.objects.create(user=self.user, author=author)
+        new_post = Post.objects.create(text=str(uuid1()), author=author)
+        self.create_user_post()
+
+        timeline = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(
+            set(timeline.values_list('post_id', flat=True)),
+            {old_post.id, new_post.id},
+            msg='Лента подписок не заполняется при подписке и публикации')
+
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(timeline.count(), 2,
+                         msg='Команда rebuild_timelines не восстанавливает ленту')
+
+        self.client.force_login(self.user)
+        self.client.get(f'/{author.username}/unfollow/')
+        self.assertFalse(timeline.exists(),
+                         msg='Записи автора остаются в ленте после отписки')
+
+    def test_counters(self):
+        post = self.create_user_post()
+        author = post.author
+        Comment.objects.create(post=post, author=self.user, text='test')
+        Follow.objects.create(user=self.user, author=author)
+
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        post.text = str(uuid1())
+        post.comment_count = 0
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1,
+                         msg='Редактирование записи перезаписывает счетчик комментариев')
+
+        response = self.client.get(f'/{author.username}/')
+        profile = response.context['profile']
+        self.assertEqual(
+            (profile.post_count, profile.followers_count, profile.following_count),
+            (1, 1, 0), msg='Счетчики профиля не соответствуют данным')
+
+        UserStats.objects.filter(user=author).update(post_count=10)
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=author).post_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+
+        UserStats.objects.filter(user=author).update(followers_count=0)
+        Post.objects.filter(pk=post.pk).update(comment_count=0)
+        Comment.objects.filter(post=post).delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 0,
+                         msg='Счетчик комментариев уходит ниже нуля')
+        post.delete()
+        self.assertEqual(UserStats.objects.get(user=author).post_count, 0)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(UserStats.objects.get(user=self.user).following_count, 0)
+        self.assertEqual(UserStats.objects.get(user=author).followers_count, 0,
+                         msg='Счетчик подписчиков уходит ниже нуля')
+
+    def test_thumbnail_pregeneration(self):
+        with self.create_temp_image_file() as image_file:
+            post = Post.objects.create(
+                text=str(uuid1()), author=self.user, image=image_file.name)
+
+            response = self.client.get('/')
+            self.assertContains(
+                response, 'thumbnail_placeholder.svg',
+                msg_prefix='Миниатюра генерируется во время запроса')
+
+            thumbnails.generate(post.image.name)
+            response = self.client.get('/')
+            self.assertNotContains(
+                response, 'thumbnail_placeholder.svg',
+                msg_prefix='Готовая миниатюра не отображается в ленте')
+            self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        image_file.close()
+        delete(image_file)
+
+        future = Future()
+        future.set_exception(OSError('broken image'))
+        with self.assertLogs('posts.thumbnails', 'ERROR') as logs:
+            thumbnails._log_failure('posts/broken.jpg', future)
+        self.assertIn('posts/broken.jpg', logs.output[0],
+                      msg='Ошибка создания миниатюры не попадает в лог')
+
+    def test_thumbnail_lookup_queries(self):
+        def page_queries(count):
+            for _ in range(count):
+                with self.create_temp_image_file() as image_file:
+                    post = Post.objects.create(
+                        text=str(uuid1()), author=self.user, image=image_file.name)
+                    thumbnails.generate(post.image.name)
+                    image_files.append(image_file)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/')
+            self.assertNotContains(response, 'thumbnail_placeholder.svg')
+            return len(queries)
+
+        image_files = []
+        queries_small_page = page_queries(2)
+        queries_full_page = page_queries(8)
+        for image_file in image_files:
+            delete(image_file)
+        self.assertEqual(
+            queries_small_page, queries_full_page,
+            msg='Количество запросов миниатюр зависит от числа записей на странице')
+
+    def test_search(self):
+        strong = Post.objects.create(
+            text='Яблоки, яблоки и еще раз яблоки', author=self.user)
+        weak = Post.objects.create(
+            text='Рецепт пирога и немного про яблоки', author=self.user)
+        other = Post.objects.create(text='Про погоду', author=self.user)
+
+        response = self.client.get('/search/', {'q': 'яблоки'})
+        self.assertEqual(list(response.context['page_obj']), [strong, weak],
+                         msg='Поиск возвращает неверные записи или не ранжирует их')
+
+        other.text = 'Яблоки на завтрак'
+        other.save()
+        weak.delete()
+        response = self.client.get('/search/', {'q': 'яблок'})
+        self.assertEqual(set(response.context['page_obj']), {strong, other},
+                         msg='Поисковый индекс не обновляется при изменении записей')
+
+        response = self.client.get('/search/', {'q': '"AND (OR'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get(self):
+        group = Group.objects.create(title='test', slug='test-group', description='test')
+        post = self.create_user_post()
+        post.group = group
+        post.save()
+        urls = ['/', f'/{post.author.username}/',
+                f'/{post.author.username}/{post.id}/', f'/group/{group.slug}/']
+        etags = {}
+        for url in urls:
+            # Первый ответ выставляет CSRF cookie, от которой зависит ETag.
+            self.client.get(url)
+            response = self.client.get(url)
+            etags[url] = response['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304,
+                             msg=f'{url} не отвечает 304 на неизмененную страницу')
+
+        Comment.objects.create(post=post, author=self.user, text='test')
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200,
+                             msg=f'{url} отвечает 304 после нового комментария')
+
+        etag = self.client.get(f'/group/{group.slug}/')['ETag']
+        group.description = 'new'
+        group.save()
+        response = self.client.get(f'/group/{group.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200,
+                         msg='Страница сообщества отвечает 304 после изменения описания')
+
+        profile_urls = urls[1:3]
+        profile_etags = {url: self.client.get(url)['ETag'] for url in profile_urls}
+        post.author.first_name = 'Лев'
+        post.author.save()
+        for url in profile_urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=profile_etags[url])
+            self.assertEqual(response.status_code, 200,
+                             msg=f'{url} отвечает 304 после изменения имени автора')
+
+        self.client.force_login(self.user)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etags['/'])
+        self.assertEqual(response.status_code, 200,
+                         msg='Страница для анонимного пользователя отдается 304 после входа')
+
+    def test_import_dump(self):
+        existing = User.objects.create_user(username='leo')
+        users = User.objects.count()
+        records = [
+            {'model': 'auth.user', 'pk': 7, 'fields': {'username': 'leo', 'password': ''}},
+            {'model': 'auth.user', 'pk': 9, 'fields': {'username': 'sonya', 'password': ''}},
+            {'model': 'auth.group', 'pk': 1, 'fields': {'name': 'staff', 'permissions': []}},
+            {'model': 'posts.group', 'pk': 3, 'fields': {'title': 'leo', 'slug': 'leo', 'description': ''}},
+        ] + [
+            {'model': 'posts.post', 'pk': pk, 'fields': {
+                'text': f'Запись {pk}', 'pub_date': f'1854-03-{pk:02}T00:00:00Z',
+                'author': 7, 'group': 3, 'image': ''}}
+            for pk in (5, 6, 8)
+        ] + [
+            {'model': 'posts.comment', 'pk': 1, 'fields': {
+                'post': 8, 'author': 9, 'text': 'Комментарий', 'created': '1854-03-20T00:00:00Z'}},
+            {'model': 'posts.follow', 'pk': 1, 'fields': {'user': 9, 'author': 7}},
+        ]
+        with NamedTemporaryFile('w', suffix='.json') as dump:
+            json.dump(records, dump)
+            dump.flush()
+            call_command('import_dump', dump.name, chunk_size=2, stdout=StringIO())
+
+        reader = User.objects.get(username='sonya')
+        self.assertEqual(User.objects.count(), users + 1,
+                         msg='Существующий пользователь создан повторно')
+        posts = Post.objects.filter(author=existing).order_by('pub_date')
+        self.assertEqual([p.text for p in posts], ['Запись 5', 'Запись 6', 'Запись 8'],
+                         msg='Записи не привязаны к существующему автору')
+        self.assertEqual(posts[0].pub_date.year, 1854,
+                         msg='Дата публикации не сохранена из дампа')
+        self.assertEqual(posts[0].group.slug, 'leo')
+        comment = Comment.objects.get()
+        self.assertEqual((comment.post, comment.author), (posts[2], reader),
+                         msg='Внешние ключи комментария не пересчитаны')
+        self.assertTrue(Follow.objects.filter(user=reader, author=existing).exists())
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(), 3,
+                         msg='Ленты не пересобраны после загрузки')
+        self.assertEqual(UserStats.objects.get(user=existing).post_count, 3,
+                         msg='Счетчики не пересчитаны после загрузки')
+        self.assertEqual(posts[2].comment_count, 1)
+
+        long_text = 'x' * READ_SIZE * 3
+        records = list(read_records(StringIO(json.dumps(
+            [{'text': long_text}, {'value': False}]))))
+        self.assertEqual(records, [{'text': long_text}, {'value': False}],
+                         msg='Запись длиннее одного чтения не разбирается')
+        stream = StringIO('[{"pk": 1}, {"pk" 2}, ' + '{"pk": 3}, ' * READ_SIZE + ']')
+        with self.assertRaisesMessage(ValueError, 'character 18'):
+            list(read_records(stream))
+        self.assertLessEqual(stream.tell(), READ_SIZE,
+                             msg='После ошибки в дампе читается остаток файла')
+        with self.assertRaisesMessage(ValueError, 'Malformed record'):
+            list(read_records(StringIO('[{"pk": 1}, {"pk": ')))
+
+
+    def test_generate_data(self):
+        def generate(seed):
+            first = User.objects.order_by('-pk').first().pk + 1
+            call_command('generate_data', users=30, groups=3, posts=200, comments=300,
+                         follows=5, seed=seed, stdout=StringIO())
+            return [(post.author_id - first, post.text, post.pub_date)
+                    for post in Post.objects.filter(author__pk__gte=first).order_by('pk')]
+
+        posts = generate(seed=1)
+        self.assertEqual(len(posts), 200)
+        self.assertEqual(posts, generate(seed=1),
+                         msg='Данные с одним seed различаются')
+        self.assertNotEqual(posts, generate(seed=2),
+                            msg='Данные с разными seed совпадают')
+        self.assertEqual(sum(Post.objects.values_list('comment_count', flat=True)),
+                         Comment.objects.count(), msg='Счетчики не пересчитаны')
+        self.assertEqual(TimelineEntry.objects.count(),
+                         Follow.objects.filter(author__author_posts__isnull=False).count(),
+                         msg='Ленты не пересобраны')
+        self.assertTrue(search.search(Post.objects.all(), 'дневник').exists(),
+                        msg='Сгенерированные записи не попали в поисковый индекс')
+        post = self.create_user_post()
+        self.assertEqual(list(search.search(Post.objects.all(), post.text)), [post],
+                         msg='Поисковый индекс не обновляется после генерации')
+
+    def test_follow_graph(self):
+        authors = [self.create_user_post().author for _ in range(3)]
+        Follow.objects.create(user=self.user, author=authors[0])
+        self.client.force_login(self.user)
+        self.client.get(f'/{authors[1].username}/follow/')
+        follow_graph = graph.get_graph()
+        self.assertTrue(follow_graph.is_following(self.user.pk, authors[1].pk),
+                        msg='Граф подписок не обновляется при подписке')
+        self.assertEqual(follow_graph.following_ids(self.user.pk), [authors[0].pk, authors[1].pk])
+        self.assertEqual(follow_graph.followers_count(authors[0].pk), 1)
+
+        self.client.get(f'/{authors[0].username}/unfollow/')
+        self.assertEqual(graph.get_graph().following_ids(self.user.pk), [authors[1].pk],
+                         msg='Граф подписок не обновляется при отписке')
+
+        # Another process committed a follow.
+        graph._publish((True, authors[2].pk, self.user.pk))
+        self.assertEqual(graph.get_graph().follower_ids(self.user.pk), [authors[2].pk],
+                         msg='Граф подписок не получает изменения других процессов')
+
+        # Другой процесс взял номер изменения, но еще не записал его.
+        follow_graph = graph.get_graph()
+        seq = cache.incr(graph.SEQ_KEY)
+        cache.set(graph.log_key(seq + 1), (True, authors[1].pk, authors[2].pk), graph.LOG_TIMEOUT)
+        cache.incr(graph.SEQ_KEY)
+        self.assertIs(graph.get_graph(), follow_graph,
+                      msg='Граф подписок перезагружается, пока изменение другого процесса не записано')
+        cache.set(graph.log_key(seq), (True, authors[0].pk, authors[2].pk), graph.LOG_TIMEOUT)
+        self.assertEqual(graph.get_graph().follower_ids(authors[2].pk), [authors[0].pk, authors[1].pk])
+        self.assertIs(graph.get_graph(), follow_graph)
+        cache.incr(graph.SEQ_KEY)
+        with mock.patch.object(graph, 'GAP_TIMEOUT', 0):
+            self.assertIsNot(graph.get_graph(), follow_graph,
+                             msg='Граф подписок не перезагружается после потери изменения')
+
+        cache.clear()
+        self.assertEqual(graph.get_graph().following_count(authors[2].pk), 0,
+                         msg='Граф подписок не перезагружается после потери журнала изменений')
+
+    def test_follow_graph_compaction(self):
+        adjacency = graph.Adjacency([1, 1, 3], [2, 5, 1], 4)
+        expected = {(1, 2), (1, 5), (3, 1)}
+        for i in range(3000):
+            edge = (i % 50, i % 7)
+            if i % 3:
+                adjacency.add(*edge)
+                expected.add(edge)
+            else:
+                adjacency.remove(*edge)
+                expected.discard(edge)
+        self.assertEqual(set(adjacency.edges()), expected,
+                         msg='Граф подписок теряет изменения при уплотнении')
+        self.assertLess(adjacency.changes, 1000)
+        self.assertEqual(adjacency.count(1), len([edge for edge in expected if edge[0] == 1]))
+
+    def test_suggestions(self):
+        followed, suggested, commenter = [self.create_user_post() for _ in range(3)]
+        Follow.objects.create(user=self.user, author=followed.author)
+        Follow.objects.create(user=followed.author, author=suggested.author)
+        Comment.objects.create(post=followed, author=self.user, text='test')
+        Comment.objects.create(post=followed, author=commenter.author, text='test')
+        call_command('update_suggestions', stdout=StringIO())
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/{followed.author.username}/')
+        self.assertEqual([s.author for s in response.context['suggestions']],
+                         [suggested.author, commenter.author],
+                         msg='В профиле не отображаются рекомендации авторов')
+        self.assertContains(response, f'@{suggested.author.username}')
+
+        self.client.get(f'/{suggested.author.username}/follow/')
+        response = self.client.get('/follow/')
+        self.assertEqual([s.author for s in response.context['suggestions']], [commenter.author],
+                         msg='Автор остается в рекомендациях после подписки')
+        self.assertEqual(suggestions.update(), 1,
+                         msg='Рекомендации пересчитываются не только для изменившихся пользователей')
+        self.assertEqual(
+            list(Suggestion.objects.filter(user=self.user).values_list('author', flat=True)),
+            [commenter.author.pk])
+
+    def test_suggestions_queued_during_update(self):
+        followed, other = [self.create_user_post().author for _ in range(2)]
+        Follow.objects.create(user=self.user, author=followed)
+        suggest = suggestions.suggest
+
+        def suggest_and_follow(user_ids, graph):
+            result = suggest(user_ids, graph)
+            Follow.objects.get_or_create(user=self.user, author=other)
+            return result
+
+        with mock.patch.object(suggestions, 'suggest', suggest_and_follow):
+            self.assertEqual(suggestions.update(), 1)
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user_id', flat=True)), [self.user.pk],
+            msg='Пользователь, снова попавший в очередь во время пересчета, удаляется из очереди')
+        self.assertEqual(suggestions.update(), 1)
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_suggestions_followers_of_follower(self):
+        follower, followed = [self.create_user_post().author for _ in range(2)]
+        Follow.objects.create(user=follower, author=self.user)
+        suggestions.update()
+        Follow.objects.create(user=self.user, author=followed)
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user_id', flat=True)), [self.user.pk],
+            msg='Подписка ставит в очередь рекомендаций подписчиков подписавшегося')
+        self.assertEqual(suggestions.update(), 2)
+        self.assertEqual(
+            list(Suggestion.objects.filter(user=follower).values_list('author', flat=True)), [followed.pk],
+            msg='Рекомендации подписчиков не пересчитываются после подписки')
+
+    def test_suggestions_busy_post(self):
+        post = self.create_user_post()
+        commenters = [self.create_user_post().author for _ in range(3)]
+        for author in commenters[:2]:
+            Comment.objects.create(post=post, author=author, text='test')
+        suggestions.update()
+        with mock.patch.object(suggestions, 'COMMENTERS_LIMIT', 1):
+            Comment.objects.create(post=post, author=commenters[2], text='test')
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user_id', flat=True)), [commenters[2].pk],
+            msg='Комментарий к записи с большим числом комментариев ставит в очередь всех комментаторов')
+
+    def test_cascade_delete(self):
+        author, commenter, other = [self.create_user_post().author for _ in range(3)]
+        post = Post.objects.get(author=author)
+        kept = Post.objects.get(author=other)
+        for _ in range(20):
+            Comment.objects.create(post=post, author=commenter, text='test')
+        for user in (author, author, commenter):
+            Comment.objects.create(post=kept, author=user, text='test')
+        suggestions.update()
+
+        def comment_buckets():
+            return set(ActivityBucket.objects.filter(kind=trending.POST_COMMENTS, count__gt=0).values_list(
+                'object_id', 'hour', 'count'))
+
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertLess(len(queries), 20, msg='Комментарии удаляемой записи обрабатываются по одному')
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user_id', flat=True)), [commenter.pk],
+            msg='Комментаторы удаленной записи не ставятся в очередь рекомендаций')
+
+        author.delete()
+        kept.refresh_from_db()
+        self.assertEqual(kept.comment_count, 1, msg='Счетчик комментариев не учитывает удаление автора')
+        buckets = comment_buckets()
+        trending.rebuild()
+        self.assertEqual(comment_buckets(), buckets,
+                         msg='Корзины активности расходятся с таблицами после удаления пользователя')
+        self.assertEqual(Post.objects.get(pk=kept.pk).comment_count, 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_trending(self):
+        quiet, busy = [Group.objects.create(title=str(uuid1()), description='test') for _ in range(2)]
+        posts = [Post.objects.create(text=str(uuid1()), author=self.user, group=busy) for _ in range(3)]
+        Post.objects.create(text=str(uuid1()), author=self.user, group=quiet)
+        author = self.create_user_post().author
+        for post in posts[:2]:
+            Comment.objects.create(post=post, author=author, text='test')
+        Comment.objects.create(post=posts[1], author=self.user, text='test')
+        Follow.objects.create(user=self.user, author=author)
+        old = timezone.now() - trending.WINDOW - timezone.timedelta(hours=2)
+        trending.record(trending.POST_COMMENTS, [(posts[0].pk, old, 1)])
+        ActivityBucket.objects.create(kind=trending.POST_COMMENTS, object_id=posts[0].pk, hour=old, count=5)
+
+        self.assertEqual(ActivityBucket.objects.get(kind=trending.GROUP_POSTS, object_id=busy.pk).count, 3,
+                         msg='Записи группы за один час не складываются в одну корзину')
+        buckets = set(ActivityBucket.objects.exclude(hour=old).values_list('kind', 'object_id', 'hour', 'count'))
+        call_command('rollup_trending', stdout=StringIO())
+        self.assertFalse(ActivityBucket.objects.filter(hour=old).exists(),
+                         msg='Устаревшие корзины активности не удаляются')
+        self.assertEqual(Trend.objects.get(kind=trending.POST_COMMENTS, object_id=posts[0].pk).count, 1)
+        trending.rebuild()
+        self.assertEqual(set(ActivityBucket.objects.values_list('kind', 'object_id', 'hour', 'count')), buckets,
+                         msg='Пересчет корзин по таблицам расходится с обновлением при записи')
+
+        response = self.client.get('/')
+        self.assertEqual([post['id'] for post in response.context['trending']['posts']],
+                         [posts[1].pk, posts[0].pk], msg='На главной странице нет обсуждаемых записей')
+        self.assertEqual([group['slug'] for group in response.context['trending']['groups']],
+                         [busy.slug, quiet.slug])
+        self.assertContains(response, f'@{author.username}')
+
+        Post.objects.create(text=str(uuid1()), author=self.user, group=quiet)
+        response = self.client.get('/group/')
+        self.assertEqual(list(response.context['object_list']), [busy, quiet],
+                         msg='Сообщества упорядочены не по активности')
+        self.assertEqual(response.context['object_list'][0].recent_posts, 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/')
+        self.assertFalse(any('posts_trend' in q['sql'] for q in queries.captured_queries),
+                         msg='Популярное на главной странице читается из базы, а не из кэша')
+
+    def test_image_processing(self):
+        self.client.force_login(self.user)
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90° clockwise.
+        exif[0x010f] = 'Camera'
+        content = BytesIO()
+        Image.new('RGB', (3000, 2000), (200, 10, 10)).save(content, 'JPEG', exif=exif)
+        upload = SimpleUploadedFile('photo.jpg', content.getvalue(), 'image/jpeg')
+        self.client.post('/new/', {'text': 'test', 'image': upload})
+
+        post = Post.objects.get(text='test')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, settings.POST_IMAGE_FORMAT,
+                             msg='Загруженное изображение не перекодируется')
+            self.assertEqual(image.size, (1280, 1920),
+                             msg='Загруженное изображение не уменьшается с учетом ориентации')
+            self.assertFalse(image.getexif(), msg='В загруженном изображении остаются метаданные EXIF')
+        self.assertEqual((post.image_width, post.image_height), (1280, 1920),
+                         msg='Размеры изображения не сохраняются в записи')
+
+        image = post.image
+        self.client.post(f'/{self.user.username}/{post.id}/edit/', {'text': 'test', 'image-clear': 'on'})
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (None, None))
+        delete(image)
+
+    def test_truncated_image(self):
+        self.client.force_login(self.user)
+        content = BytesIO()
+        Image.effect_noise((400, 400), 64).convert('RGB').save(content, 'JPEG')
+        upload = SimpleUploadedFile('photo.jpg', content.getvalue()[:content.tell() // 2], 'image/jpeg')
+        response = self.client.post('/new/', {'text': 'test', 'image': upload})
+        self.check_image_error(response, 'Обрезанное изображение не отклоняется формой')
+        self.assertFalse(Post.objects.filter(text='test').exists())
+
+    def test_card_urls(self):
+        group = Group.objects.create(title='test', slug='test-group_1')
+        for username in ('.', 'ü.@+-_1', 'user'):
+            author = User.objects.create_user(username=username)
+            post = Post.objects.create(text='test', author=author, group=group)
+            for name, args in (('profile', [username]), ('group', [group.slug]),
+                               ('post', [username, post.id]), ('post_edit', [username, post.id])):
+                self.assertEqual(cards.UrlPattern(name, len(args))(*args), reverse(name, args=args),
+                                 msg='Ссылка в карточке записи отличается от reverse()')
+
+        self.client.force_login(author)
+        response = self.client.get('/')
+        for url in (reverse('profile', args=['ü.@+-_1']), reverse('post_edit', args=['user', post.id])):
+            self.assertContains(response, f'href="{url}"', msg_prefix='В карточке записи нет ссылки')
+        response = self.client.get(f'/user/{post.id}/')
+        self.assertContains(response, 'Редактировать', msg_prefix='На странице записи нет ссылки редактирования')
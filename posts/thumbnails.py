@@ -0,0 +1,133 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_pool = None
+
+logger = logging.getLogger(__name__)
+
+
+class Backend(ThumbnailBackend):
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        # Same name resolution as get_thumbnail(), without generating.
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = Backend()
+
+
+def feed_thumbnail(image):
+    if not image:
+        return None
+    return default.kvstore.get(
+        backend.get_thumbnail_file(image, FEED_GEOMETRY, **FEED_OPTIONS))
+
+
+def _fetch_cached_db(keys):
+    empty = cached_db_kvstore.EMPTY_VALUE
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        kv_cache.set_many(
+            {key: found.get(key, empty) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {key: deserialize_image_file(value)
+            for key, value in values.items()
+            if value and value != empty}
+
+
+def prefetch(posts):
+    # One cache get_many() and at most one query for a whole page instead
+    # of a key-value store round-trip per {% thumbnail %}.
+    targets = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            thumbnail = backend.get_thumbnail_file(
+                post.image, FEED_GEOMETRY, **FEED_OPTIONS)
+            targets.setdefault(add_prefix(thumbnail.key), []).append(post)
+    if not targets:
+        return
+    if isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        found = _fetch_cached_db(list(targets))
+    else:
+        found = {key: default.kvstore._get_raw(key) for key in targets}
+        found = {key: deserialize_image_file(value)
+                 for key, value in found.items() if value}
+    for key, thumbnail in found.items():
+        for post in targets[key]:
+            post.thumbnail = thumbnail
+
+
+def post_thumbnail(post):
+    if not hasattr(post, 'thumbnail'):
+        prefetch([post])
+    return post.thumbnail
+
+
+def generate(name):
+    from .models import Post
+
+    backend.get_thumbnail(name, FEED_GEOMETRY, **FEED_OPTIONS)
+    # Cached post cards still show the placeholder.
+    Post.objects.filter(image=name).update(version=F('version') + 1)
+    return name
+
+
+def _setup_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+
+def get_pool(workers=None):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=workers or settings.THUMBNAIL_WORKERS,
+            mp_context=get_context('spawn'),
+            initializer=_setup_worker)
+    return _pool
+
+
+def _log_failure(name, future):
+    # Nobody waits for the result: failures would pass unnoticed.
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Thumbnail generation failed for %s', name,
+                     exc_info=future.exception())
+
+
+def schedule(name):
+    future = get_pool().submit(generate, name)
+    future.add_done_callback(partial(_log_failure, name))
+    return future
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from django.db import connections, router
+
+from .models import Follow, Post, TimelineEntry
+
+
+def _insert(entries):
+    # No batch_size: the backend's own limit applies, SQLite can't take
+    # more than 500 rows in one insert.
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out(*posts):
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(
+        author_id__in=by_author).values_list('user_id', 'author_id')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      pub_date=post.pub_date)
+        for user_id, author_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild(users=None):
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    entries.delete()
+    # One INSERT ... SELECT rather than backfill() per follow: the
+    # database joins follows with posts, no row goes through Python.
+    using = router.db_for_write(TimelineEntry)
+    connection = connections[using]
+    rows = follows.filter(author__author_posts__isnull=False).values_list(
+        'user_id', 'author__author_posts__id',
+        'author__author_posts__pub_date')
+    sql, params = rows.query.get_compiler(using).as_sql()
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(TimelineEntry._meta.get_field(name).column)
+        for name in ('user', 'post', 'pub_date'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+            f'({columns}) {sql}', params)
+    return follows.count()
@@ -0,0 +1,160 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .models import ActivityBucket, Comment, Group, Post, Trend, User
+
+GROUP_POSTS = ActivityBucket.GROUP_POSTS
+POST_COMMENTS = ActivityBucket.POST_COMMENTS
+AUTHOR_FOLLOWS = ActivityBucket.AUTHOR_FOLLOWS
+
+# Buckets older than WINDOW are dropped by rollup(), an hour of activity
+# weighs half as much every HALF_LIFE.
+WINDOW = timedelta(days=7)
+HALF_LIFE = timedelta(hours=24)
+
+SNAPSHOT_KEY = 'trending:snapshot'
+SNAPSHOT_SIZE = 5
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def record(kind, events):
+    # events: (object_id, when, delta). Deltas are summed per hourly
+    # bucket and added with one upsert per bucket.
+    since = _hour(timezone.now()) - WINDOW
+    counts = Counter()
+    for object_id, when, delta in events:
+        if object_id is not None and when >= since:
+            counts[object_id, _hour(when)] += delta
+    if not counts:
+        return
+    using = router.db_for_write(ActivityBucket)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(ActivityBucket._meta.db_table)
+    *key, count = [
+        quote(ActivityBucket._meta.get_field(name).column)
+        for name in ('kind', 'object_id', 'hour', 'count')]
+    key = ', '.join(key)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({key}, {count}) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT ({key}) DO UPDATE SET '
+            f'{count} = {table}.{count} + excluded.{count}',
+            [(kind, object_id,
+              connection.ops.adapt_datetimefield_value(hour), delta)
+             for (object_id, hour), delta in counts.items()])
+
+
+def comments_deleted(comments):
+    # comments: a queryset, summed per post and hour by the database.
+    record(POST_COMMENTS, [
+        (post_id, hour, -count)
+        for post_id, hour, count in comments.annotate(
+            hour=TruncHour('created')).order_by().values_list(
+                'post_id', 'hour').annotate(count=Count('pk'))])
+
+
+def forget(kind, object_ids):
+    ActivityBucket.objects.filter(
+        kind=kind, object_id__in=object_ids).delete()
+
+
+def rollup():
+    """Drop expired buckets and replace Trend with decayed scores and
+    counts over the window, then refresh the index page snapshot."""
+    now = timezone.now()
+    ActivityBucket.objects.filter(hour__lt=_hour(now) - WINDOW).delete()
+    scores, counts = defaultdict(float), Counter()
+    buckets = ActivityBucket.objects.values_list(
+        'kind', 'object_id', 'hour', 'count')
+    for kind, object_id, hour, count in buckets.iterator():
+        scores[kind, object_id] += count * 0.5 ** ((now - hour) / HALF_LIFE)
+        counts[kind, object_id] += count
+    with transaction.atomic():
+        Trend.objects.all().delete()
+        Trend.objects.bulk_create(
+            Trend(kind=kind, object_id=object_id, score=score,
+                  count=counts[kind, object_id])
+            for (kind, object_id), score in scores.items()
+            if counts[kind, object_id] > 0)
+    transaction.on_commit(
+        lambda: cache.set(SNAPSHOT_KEY, _snapshot(), None),
+        using=router.db_for_write(Trend))
+    return len(scores)
+
+
+def rebuild():
+    # Post and comment buckets from the tables themselves, after writes
+    # that bypass the signals. Follows have no date to rebuild from.
+    since = _hour(timezone.now()) - WINDOW
+    with transaction.atomic():
+        ActivityBucket.objects.filter(
+            kind__in=[GROUP_POSTS, POST_COMMENTS]).delete()
+        for kind, queryset, field, date in (
+                (GROUP_POSTS, Post.objects.filter(group__isnull=False),
+                 'group_id', 'pub_date'),
+                (POST_COMMENTS, Comment.objects.all(), 'post_id', 'created')):
+            rows = queryset.filter(**{f'{date}__gte': since}).order_by(
+            ).annotate(bucket=TruncHour(date)).values_list(
+                field, 'bucket').annotate(count=Count('pk'))
+            ActivityBucket.objects.bulk_create(
+                ActivityBucket(kind=kind, object_id=object_id, hour=hour,
+                               count=count)
+                for object_id, hour, count in rows.iterator())
+    return rollup()
+
+
+def _top(kind, queryset):
+    top = list(Trend.objects.filter(kind=kind).order_by(
+        '-score').values_list('object_id', 'count')[:SNAPSHOT_SIZE * 2])
+    # Objects deleted since the roll-up are skipped.
+    objects = queryset.in_bulk([object_id for object_id, _ in top])
+    return [(objects[object_id], count) for object_id, count in top
+            if object_id in objects][:SNAPSHOT_SIZE]
+
+
+def _snapshot():
+    posts = Post.objects.select_related('author').only(
+        'id', 'text', 'author__username')
+    return {
+        'posts': [
+            {'id': post.id, 'author': post.author.username,
+             'text': Truncator(post.text).chars(80), 'count': count}
+            for post, count in _top(POST_COMMENTS, posts)],
+        'groups': [
+            {'slug': group.slug, 'title': group.title, 'count': count}
+            for group, count in _top(
+                GROUP_POSTS, Group.objects.only('slug', 'title'))],
+        'authors': [
+            {'username': user.username, 'count': count}
+            for user, count in _top(
+                AUTHOR_FOLLOWS, User.objects.only('username'))],
+    }
+
+
+def snapshot():
+    # Top posts, groups and authors as plain data: one cache read per
+    # page, rebuilt from Trend if the cache lost it.
+    data = cache.get(SNAPSHOT_KEY)
+    if data is None:
+        data = _snapshot()
+        cache.set(SNAPSHOT_KEY, data, None)
+    return data
+
+
+def ranked_groups():
+    trend = Trend.objects.filter(kind=GROUP_POSTS, object_id=OuterRef('pk'))
+    return Group.objects.annotate(
+        score=Coalesce(Subquery(trend.values('score')), 0.0),
+        recent_posts=Coalesce(Subquery(trend.values('count')), 0),
+    ).order_by('-score', 'title')
@@ -3,10 +3,12 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.PostList.as_view(), name='index'),
+    path('', views.IndexView.as_view(), name='index'),
+    path('group/', views.GroupList.as_view(), name='groups'),
     path('group/<slug:slug>/', views.GroupView.as_view(), name='group'),
     path('new/', views.CreatePost.as_view(), name='new_post'),
     path('follow/', views.FollowList.as_view(), name='follow_index'),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('<str:username>/', views.ProfileView.as_view(), name='profile'),
     path('<str:username>/<int:post_id>/',
          views.PostView.as_view(), name='post'),
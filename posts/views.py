@@ -1,4 +1,6 @@
-from django.db.models import Count
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.views.generic import RedirectView, TemplateView
 from django.views.generic.list import ListView
@@ -6,28 +8,120 @@ from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import CreateView, FormMixin, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
 
+from yatube.db import read_replica
 
 from .models import Comment, Follow, Group, Post, User
 from .forms import CommentForm, PostForm
+from .graph import get_graph
+from .conditional import ConditionalGetMixin
+from .pagination import CursorPaginator
+from .search import search
+from .suggestions import suggestions_for
+from .trending import ranked_groups, snapshot as trending_snapshot
+
+
+class ReplicaReadMixin:
+    def dispatch(self, request, *args, **kwargs):
+        with read_replica(request):
+            response = super().dispatch(request, *args, **kwargs)
+            # Templates evaluate querysets, render before leaving.
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 
-class PostList(ListView):
+class PostList(ReplicaReadMixin, ConditionalGetMixin, ListView):
     model = Post
-    queryset = Post.objects.select_related('author', 'group').annotate(
-        comment_count=Count('comments', distinct=True)
-    )
+    queryset = Post.objects.select_related('author', 'group')
     template_name = 'index.html'
     paginate_by = 10
+    cursor_fields = ('pub_date', 'id')
+    etag_fields = ('id', 'version', 'pub_date')
+
+    def get_etag_parts(self):
+        # Plain rows: deferred instances would load the other fields one
+        # query per object.
+        rows = self.get_queryset().values(*self.etag_fields)
+        page = self.paginate_queryset(rows, self.paginate_by)[1]
+        return [tuple(row[field] for field in self.etag_fields)
+                for row in page]
+
+    def get_feed_filter(self):
+        # Applied by paginate_queryset(), see FollowList.
+        return Q()
+
+    def paginate_queryset(self, queryset, page_size):
+        where = self.get_feed_filter()
+        if not settings.POSTS_CURSOR_PAGINATION:
+            return super().paginate_queryset(queryset.filter(where), page_size)
+        paginator = CursorPaginator(
+            queryset, page_size, *self.cursor_fields, where=where)
+        page = paginator.page(before=self.request.GET.get('before'),
+                              after=self.request.GET.get('after'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = settings.POSTS_CURSOR_PAGINATION
+        return context
 
 
-class FollowList(LoginRequiredMixin, PostList):
+class IndexView(PostList):
+    # Trending posts, groups and authors come from the snapshot that
+    # rollup_trending leaves in the cache.
+    @cached_property
+    def trending(self):
+        return trending_snapshot()
+
+    def get_etag_parts(self):
+        return [self.trending, *super().get_etag_parts()]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['trending'] = self.trending
+        return context
+
+
+class GroupList(ReplicaReadMixin, ListView):
+    template_name = 'groups.html'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return ranked_groups()
+
+
+class SuggestionsMixin:
+    # Follow suggestions of the viewer, precomputed by update_suggestions.
+    @cached_property
+    def suggestions(self):
+        return suggestions_for(self.request.user)
+
+    def get_etag_parts(self):
+        return [*((suggestion.author_id, suggestion.author.username)
+                  for suggestion in self.suggestions),
+                *super().get_etag_parts()]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['suggestions'] = self.suggestions
+        return context
+
+
+class FollowList(LoginRequiredMixin, SuggestionsMixin, PostList):
     template_name = 'follow.html'
+    cursor_fields = ('timeline_entries__pub_date', 'id')
 
     def get_queryset(self):
-        user = self.request.user
-        return self.queryset.filter(author__in=Follow.objects.filter(
-            user=user).values('author'))
+        return self.queryset.order_by('-timeline_entries__pub_date', '-id')
+
+    def get_feed_filter(self):
+        # Filtered together with the cursor range: a filter() call of its
+        # own would join the timeline again, once per follower of the
+        # author.
+        return Q(timeline_entries__user=self.request.user)
 
 
 class GroupView(SingleObjectMixin, PostList):
@@ -41,6 +135,29 @@ class GroupView(SingleObjectMixin, PostList):
     def get_queryset(self):
         return self.queryset.filter(group=self.object)
 
+    def get_etag_parts(self):
+        group = self.object
+        return [group.title, group.description, *super().get_etag_parts()]
+
+
+class SearchView(PostList):
+    template_name = 'search.html'
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return search(self.queryset, self.query)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Results are ordered by rank, keyset pagination doesn't apply.
+        return super(PostList, self).paginate_queryset(queryset, page_size)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['cursor_pagination'] = False
+        context['page_query'] = urlencode({'q': self.query}) + '&'
+        return context
+
 
 class PostMixin:
     model = Post
@@ -81,27 +198,35 @@ class ProfileMixin(SingleObjectMixin):
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object(queryset=User.objects.annotate(
-            post_count=Count(
-                'author_posts', distinct=True),
-            followers_count=Count(
-                'following', distinct=True),
-            following_count=Count(
-                'follower', distinct=True)
-        ).all())
+            post_count=Coalesce('stats__post_count', 0),
+            followers_count=Coalesce('stats__followers_count', 0),
+            following_count=Coalesce('stats__following_count', 0),
+        ))
         return super().get(request, *args, **kwargs)
 
+    @cached_property
+    def following(self):
+        if not self.request.user.is_authenticated:
+            return False
+        return get_graph().is_following(self.request.user.pk, self.object.pk)
+
+    def get_etag_parts(self):
+        profile = self.object
+        return [
+            profile.first_name, profile.last_name,
+            profile.post_count, profile.followers_count,
+            profile.following_count, self.following,
+            *super().get_etag_parts()
+        ]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        following = False
-        if self.request.user.is_authenticated:
-            following = Follow.objects.filter(
-                user=self.request.user, author=self.object).exists()
-        context['following'] = following
+        context['following'] = self.following
 
         return context
 
 
-class ProfileView(ProfileMixin, PostList):
+class ProfileView(ProfileMixin, SuggestionsMixin, PostList):
 
     queryset = PostList.queryset
 
@@ -109,11 +234,17 @@ class ProfileView(ProfileMixin, PostList):
         return self.queryset.filter(author=self.object)
 
 
-class PostView(ProfileMixin, FormMixin, ListView):
+class PostView(ProfileMixin, FormMixin, ConditionalGetMixin, ListView):
     template_name = 'post.html'
     form_class = CommentForm
     ordering = '-created'
     paginate_by = 10
+    etag_fields = ('id', 'text')
+
+    def get_etag_parts(self):
+        comments = self.get_queryset().values_list(*self.etag_fields)
+        page = self.paginate_queryset(comments, self.paginate_by)[1]
+        return [*super().get_etag_parts(), self.post.version, *page]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -158,7 +289,8 @@ class FollowView(LoginRequiredMixin, RedirectView):
 class FollowCreate(FollowView):
 
     def get(self, request, *args, **kwargs):
-        if not self._is_author(request, **kwargs):
+        if not (self._is_author(request, **kwargs) or get_graph().is_following(
+                request.user.pk, self.author.pk)):
             Follow.objects.get_or_create(user=request.user, author=self.author)
         return super().get(request, *args, **kwargs)
 
@@ -166,7 +298,8 @@ class FollowCreate(FollowView):
 class FollowDelete(FollowView):
 
     def get(self, request, *args, **kwargs):
-        if not self._is_author(request, **kwargs):
+        if not self._is_author(request, **kwargs) and get_graph().is_following(
+                request.user.pk, self.author.pk):
             Follow.objects.filter(
                 user=request.user, author=self.author).delete()
         return super().get(request, *args, **kwargs)
@@ -1,4 +1,14 @@
+import pytest
+
+from yatube.runner import testing_settings
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def _testing_settings():
+    with testing_settings():
+        yield
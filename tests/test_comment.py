@@ -131,3 +131,39 @@ class TestCommentAPI:
         assert response.status_code == 403, \
             'Проверьте, что при DELETE запросе `/api/v1/posts/{post.id}/comments/{comment.id}/` ' \
             'для не своего комментария возвращаете статус 403'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_list_queries(self, client, post, user, another_user, django_assert_num_queries):
+        for i in range(5):
+            Comment.objects.create(post=post, author=user if i % 2 else another_user, text=f'Коммент {i}')
+
+        with django_assert_num_queries(3):
+            response = client.get(f'/api/v1/posts/{post.id}/comments/')
+        assert len(response.json()) == 5, \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/` возвращает комментарии без лишних запросов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_batch_create(self, user_client, post, another_post):
+        data = [{'text': 'Коммент 1', 'post': post.id}, {'text': 'Коммент 2', 'post': post.id}]
+        response = user_client.post(f'/api/v1/posts/{post.id}/comments/batch/', data=data, format='json')
+        assert response.status_code == 201, \
+            'Проверьте, что POST запрос на `/api/v1/posts/{post.id}/comments/batch/` возвращает статус 201'
+        assert [item['text'] for item in response.json()] == [item['text'] for item in data], \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/batch/` возвращает созданные комментарии'
+        post.refresh_from_db()
+        assert post.comment_count == 2 and post.version == 1, \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/batch/` обновляет счетчик комментариев'
+
+        data = [{'text': 'Коммент 4', 'post': post.id}, {'text': 'Коммент 5', 'post': 0}]
+        response = user_client.post(f'/api/v1/posts/{post.id}/comments/batch/', data=data, format='json')
+        assert response.status_code == 400 and 'post' in response.json()[1], \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/batch/` возвращает ошибки для каждого элемента'
+        assert Comment.objects.count() == 2, \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/batch/` не создает комментарии при ошибках'
+
+        data = [{'text': 'Коммент 6', 'post': post.id}, {'text': 'Коммент 7', 'post': another_post.id}]
+        response = user_client.post(f'/api/v1/posts/{post.id}/comments/batch/', data=data, format='json')
+        assert response.status_code == 400 and 'post' in response.json()[1], \
+            'Проверьте, что `/api/v1/posts/{post.id}/comments/batch/` не создает комментарии к другим записям'
+        assert not Comment.objects.filter(post=another_post).exists()
+
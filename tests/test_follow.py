@@ -72,6 +72,12 @@ class TestFollowAPI:
             'Проверьте, что при POST запросе на `/api/v1/follow/` ' \
             'на уже подписанного автора должен возвращаться статус 400'
 
+        # Подписка, о которой граф подписок этого процесса еще не знает.
+        Follow.objects.bulk_create([Follow(user=user, author=user_2)])
+        response = user_client.post('/api/v1/follow/', data={'following': user_2.username})
+        assert response.status_code == 400, \
+            'Проверьте, что повторная подписка возвращает статус 400, даже если граф подписок устарел'
+
     @pytest.mark.django_db(transaction=True)
     def test_follow_search_filter(self, user_client, follow_1, follow_2, follow_3, follow_4,
                                   user, user_2, another_user):
@@ -93,3 +99,54 @@ class TestFollowAPI:
         assert len(response.json()) == 3, \
             'Проверьте, что при GET запросе с параметром `search` на `/api/v1/follow/` ' \
             'возвращается список соответствующих подписок'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_list_queries(self, client, follow_1, follow_2, follow_3, follow_4,
+                                 django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/follow/')
+        assert len(response.json()) == 4, \
+            'Проверьте, что `/api/v1/follow/` возвращает подписки без лишних запросов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_batch_create(self, user_client, follow_1, user, user_2, another_user):
+        from posts.models import UserStats
+
+        data = [{'following': another_user.username}, {'following': user_2.username},
+                {'following': user_2.username}]
+        response = user_client.post('/api/v1/follow/batch/', data=data, format='json')
+        assert response.status_code == 201, \
+            'Проверьте, что POST запрос на `/api/v1/follow/batch/` возвращает статус 201'
+        assert response.json() == [{'user': user.username, 'following': user_2.username}], \
+            'Проверьте, что `/api/v1/follow/batch/` пропускает уже существующие подписки'
+        assert Follow.objects.filter(user=user).count() == 2, \
+            'Проверьте, что `/api/v1/follow/batch/` создает подписки без повторов'
+        assert UserStats.objects.get(user=user).following_count == 2, \
+            'Проверьте, что `/api/v1/follow/batch/` обновляет счетчики подписок'
+
+        response = user_client.post('/api/v1/follow/batch/', data=[{'following': 'nobody'}], format='json')
+        assert response.status_code == 400, \
+            'Проверьте, что `/api/v1/follow/batch/` возвращает 400 для несуществующего автора'
+
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_graph_rollback(self, user, user_2, another_user):
+        from django.db import transaction
+        from posts.graph import get_graph
+
+        Follow.objects.create(user=user, author=another_user)
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=user_2)
+                assert get_graph().is_following(user.id, user_2.id)
+                raise RuntimeError
+        graph = get_graph()
+        assert graph.following_ids(user.id) == [another_user.id], \
+            'Проверьте, что граф подписок не хранит подписки из отмененной транзакции'
+        assert graph.followers_count(user_2.id) == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_detail_not_routed(self, user_client, follow_1):
+        response = user_client.get(f'/api/v1/follow/{follow_1.id}/')
+        assert response.status_code == 404, \
+            'Проверьте, что у `/api/v1/follow/` нет страниц отдельных подписок'
@@ -1,4 +1,7 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from posts.models import Group
 
 
@@ -79,3 +82,18 @@ class TestGroupAPI:
         assert len(response.json()) == 2, \
             'Проверьте, что при GET запросе с параметром `group` на `/api/v1/posts/` ' \
             'возвращается список соответствующих постов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_list_queries(self, user_client, group_1):
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get('/api/v1/group/')
+            assert response.status_code == 200
+            return len(queries)
+
+        list_queries()
+        expected = list_queries()
+        for i in range(10):
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}')
+        assert list_queries() == expected, \
+            'Проверьте, что число запросов `/api/v1/group/` не растет с числом групп'
@@ -120,3 +120,144 @@ class TestPostAPI:
 
         assert response.status_code == 403, \
             'Проверьте, что при DELETE запросе `/api/v1/posts/{id}/` для не своей статьи возвращаете статус 403'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_search(self, client, post, post_2, another_post):
+        response = client.get('/api/v1/posts/', {'search': '12342341'})
+
+        assert response.status_code == 200, \
+            'Проверьте, что при GET запросе `/api/v1/posts/?search=` возвращается статус 200'
+        assert [item['id'] for item in response.json()] == [post_2.id], \
+            'Проверьте, что `/api/v1/posts/?search=` выполняет поиск по тексту статей'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_list_pagination(self, client, user, another_user, django_assert_num_queries):
+        for i in range(5):
+            Post.objects.create(text=f'Статья {i}', author=user if i % 2 else another_user)
+
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/posts/', {'page_size': 2})
+
+        assert len(response.json()) == 2, \
+            'Проверьте, что `/api/v1/posts/` поддерживает параметр `page_size`'
+        assert 'rel="next"' in response.get('Link', ''), \
+            'Проверьте, что `/api/v1/posts/` передает ссылку на следующую страницу в заголовке `Link`'
+
+        ids = [item['id'] for item in response.json()]
+        while 'rel="next"' in response.get('Link', ''):
+            next_url = response['Link'].split('>; rel="next"')[0].lstrip('<')
+            with django_assert_num_queries(2):
+                response = client.get(next_url)
+            ids.extend(item['id'] for item in response.json())
+        assert ids == list(Post.objects.values_list('id', flat=True)), \
+            'Проверьте, что постраничный вывод `/api/v1/posts/` возвращает все статьи по одному разу'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_conditional_get(self, user_client, post, another_post):
+        for url in ('/api/v1/posts/', f'/api/v1/posts/{post.id}/'):
+            response = user_client.get(url)
+            etag = response['ETag']
+            response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304, \
+                f'Проверьте, что `{url}` возвращает 304 для неизмененных данных'
+
+            user_client.patch(f'/api/v1/posts/{post.id}/', data={'text': f'Новый текст {url}'})
+            response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, \
+                f'Проверьте, что `{url}` не возвращает 304 после изменения статьи'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_auth_without_user_query(self, user_client, user, post):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user_client.get('/api/v1/posts/')
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.patch(f'/api/v1/posts/{post.id}/', data={'text': 'Новый текст'})
+        assert response.status_code == 200
+        user_queries = [query['sql'] for query in queries
+                        if query['sql'].startswith('SELECT') and 'FROM "auth_user" WHERE' in query['sql']]
+        assert not user_queries, \
+            'Проверьте, что запрос с токеном не загружает пользователя из базы данных каждый раз'
+
+        from api.authentication import user_cache
+
+        # Запись другого процесса gunicorn, в котором пользователь не изменялся.
+        entry = user_cache.users[user.id]
+        user.is_active = False
+        user.save()
+        user_cache.users[user.id] = entry
+        response = user_client.get('/api/v1/posts/')
+        assert response.status_code == 401, \
+            'Проверьте, что токен отключенного пользователя сразу перестает действовать во всех процессах'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_batch_create(self, user_client, user, follow_2, user_2):
+        from posts.models import TimelineEntry, UserStats
+
+        data = [{'text': 'Пакет 1'}, {}, {'text': 'Пакет 3'}]
+        response = user_client.post('/api/v1/posts/batch/', data=data, format='json')
+        assert response.status_code == 400, \
+            'Проверьте, что POST запрос на `/api/v1/posts/batch/` с ошибкой возвращает статус 400'
+        errors = response.json()
+        assert len(errors) == 3 and not errors[0] and 'text' in errors[1] and not errors[2], \
+            'Проверьте, что `/api/v1/posts/batch/` возвращает ошибки для каждого элемента'
+        assert Post.objects.count() == 0, \
+            'Проверьте, что `/api/v1/posts/batch/` не создает статьи, если в пакете есть ошибки'
+
+        data = [{'text': f'Пакет {i}'} for i in range(3)]
+        response = user_client.post('/api/v1/posts/batch/', data=data, format='json')
+        assert response.status_code == 201, \
+            'Проверьте, что POST запрос на `/api/v1/posts/batch/` с правильными данными возвращает статус 201'
+        test_data = response.json()
+        posts = Post.objects.order_by('id')
+        assert [item['id'] for item in test_data] == [p.id for p in posts], \
+            'Проверьте, что `/api/v1/posts/batch/` возвращает созданные статьи с их `id`'
+        assert all(p.author == user for p in posts), \
+            'Проверьте, что `/api/v1/posts/batch/` создает статьи от авторизованного пользователя'
+        assert UserStats.objects.get(user=user).post_count == 3, \
+            'Проверьте, что `/api/v1/posts/batch/` обновляет счетчик статей'
+        assert TimelineEntry.objects.filter(user=user_2).count() == 3, \
+            'Проверьте, что статьи из `/api/v1/posts/batch/` попадают в ленты подписчиков'
+
+        response = user_client.post('/api/v1/posts/batch/', data={'text': 'Пакет'}, format='json')
+        assert response.status_code == 400, \
+            'Проверьте, что `/api/v1/posts/batch/` принимает только список'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_export(self, client, post, post_2, another_post, group_1):
+        import json
+
+        response = client.get('/api/v1/posts/export/')
+        assert response.status_code == 200, \
+            'Проверьте, что `/api/v1/posts/export/` возвращает статус 200'
+        assert response.streaming and response['Content-Type'] == 'application/x-ndjson', \
+            'Проверьте, что `/api/v1/posts/export/` отдает поток в формате NDJSON'
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        assert [line['id'] for line in lines] == [post.id, post_2.id, another_post.id], \
+            'Проверьте, что `/api/v1/posts/export/` возвращает все статьи от старых к новым'
+        assert lines[0] == {'id': post.id, 'text': post.text, 'author': post.author.username,
+                            'pub_date': lines[0]['pub_date']}, \
+            'Проверьте, что строки `/api/v1/posts/export/` совпадают с сериализацией статьи'
+
+        response = client.get(f'/api/v1/posts/export/?group={group_1.id}'
+                              f'&pub_date_after={lines[1]["pub_date"]}')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [post_2.id], \
+            'Проверьте, что `/api/v1/posts/export/` фильтрует по группе и дате публикации'
+
+        response = client.get('/api/v1/posts/export/?pub_date_before=вчера')
+        assert response.status_code == 400, \
+            'Проверьте, что `/api/v1/posts/export/` возвращает 400 для неправильной даты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_export_command(self, post, another_post, group_2, tmp_path):
+        import json
+        from django.core.management import call_command
+
+        output = tmp_path / 'posts.ndjson'
+        call_command('export_posts', group=str(group_2.id), output=str(output))
+        lines = output.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [another_post.id], \
+            'Проверьте, что команда `export_posts` выгружает статьи с учетом фильтров'
+
@@ -0,0 +1,34 @@
+import pytest
+
+
+class TestSuggestionAPI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_suggestion_not_auth(self, client, follow_1):
+        response = client.get('/api/v1/suggestions/')
+        assert response.status_code == 401, \
+            'Проверьте, что `/api/v1/suggestions/` при запросе без токена возвращает статус 401'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_suggestion_get(self, user_client, user, user_2, another_user, follow_1, follow_4,
+                            comment_1_post, comment_2_post, django_assert_num_queries):
+        from posts import suggestions
+
+        assert suggestions.update() == 2, \
+            'Проверьте, что пересчитываются рекомендации пользователей с изменившимися подписками'
+        assert suggestions.update() == 0, \
+            'Проверьте, что рекомендации пересчитываются только для изменившихся пользователей'
+
+        user_client.get('/api/v1/suggestions/')
+        with django_assert_num_queries(1):
+            response = user_client.get('/api/v1/suggestions/')
+        assert response.status_code == 200
+        test_data = response.json()
+        assert [item['author'] for item in test_data] == [user_2.username], \
+            'Проверьте, что `/api/v1/suggestions/` возвращает авторов, на которых подписаны ' \
+            'авторы пользователя, без уже отслеживаемых'
+        assert test_data[0]['score'] > 0
+
+        user_client.post('/api/v1/follow/', data={'following': user_2.username})
+        assert user_client.get('/api/v1/suggestions/').json() == [], \
+            'Проверьте, что автор пропадает из рекомендаций сразу после подписки'
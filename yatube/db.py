@@ -0,0 +1,74 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def pin_key(user_id):
+    return f'replica_pin:{user_id}'
+
+
+def replica_for(request):
+    # Users who wrote something in the last DATABASE_REPLICA_PIN seconds
+    # read from the primary, replicas may not have their write yet.
+    replicas = settings.DATABASE_REPLICAS
+    user = getattr(request, 'user', None)
+    if not replicas or (user is not None and user.is_authenticated
+                        and cache.get(pin_key(user.pk))):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+@contextmanager
+def read_replica(request):
+    previous = getattr(_state, 'replica', None)
+    _state.replica = replica_for(request)
+    try:
+        yield _state.replica
+    finally:
+        _state.replica = previous
+
+
+class ReplicaRouter:
+    """Reads inside read_replica() go to a replica, everything else and
+    all writes go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    # Must come after AuthenticationMiddleware. API requests are covered
+    # too, DRF puts the authenticated user on the Django request.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (_state.wrote and settings.DATABASE_REPLICAS
+                and user is not None and user.is_authenticated):
+            cache.set(pin_key(user.pk), True, settings.DATABASE_REPLICA_PIN)
+        _state.wrote = False
+        return response
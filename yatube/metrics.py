@@ -0,0 +1,249 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import URLPattern, URLResolver, get_resolver
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Slot of one view: histogram buckets (the last one is +Inf), then these.
+COUNT = len(BUCKETS) + 1
+DURATION, QUERIES, SQL_TIME, TEMPLATE_TIME = range(COUNT, COUNT + 4)
+SLOT_SIZE = COUNT + 4
+
+UNMATCHED = '<unmatched>'
+
+_local = threading.local()
+
+
+def view_names(resolver=None, namespace=''):
+    names = []
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            names += view_names(pattern, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.append(namespace + pattern.name)
+    return sorted({UNMATCHED, *names})
+
+
+class Store:
+    """Metrics of this process in an mmap'ed file of doubles.
+
+    Every process writes only its own file, so recording needs no locks;
+    collect() adds up the files of all processes in METRICS_DIR. Slots are
+    the sorted URL names, the file name carries their hash so a deploy
+    with other URLs doesn't mix layouts.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.names = view_names()
+        self.slots = {name: i * SLOT_SIZE for i, name in enumerate(
+            self.names)}
+        self.layout = hashlib.md5(
+            '\n'.join(self.names).encode()).hexdigest()[:8]
+        self.size = len(self.names) * SLOT_SIZE * 8
+        self.pid = None
+        self.values = None
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{self.layout}_{name}.db')
+
+    def _open(self, path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            return mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+    def own(self):
+        # Reopened after fork, gunicorn workers must not share a file.
+        if self.pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self.values = memoryview(
+                self._open(self.path(os.getpid()))).cast('d')
+            self.pid = os.getpid()
+        return self.values
+
+    def record(self, name, duration, queries, sql_time, template_time):
+        values = self.own()
+        slot = self.slots.get(name, self.slots[UNMATCHED])
+        values[slot + bisect_left(BUCKETS, duration)] += 1
+        values[slot + DURATION] += duration
+        values[slot + QUERIES] += queries
+        values[slot + SQL_TIME] += sql_time
+        values[slot + TEMPLATE_TIME] += template_time
+
+    def _read(self, path):
+        values = memoryview(self._open(path)).cast('d')
+        try:
+            return values.tolist()
+        finally:
+            values.release()
+
+    def _archive(self, pids):
+        # Files of exited workers are added to one archive file and
+        # removed, totals stay monotonic and the directory stays small.
+        archive = memoryview(self._open(self.path('archive'))).cast('d')
+        for pid in pids:
+            for i, value in enumerate(self._read(self.path(pid))):
+                archive[i] += value
+            os.remove(self.path(pid))
+        archive.release()
+
+    def _files(self):
+        prefix = f'{self.layout}_'
+        return [name[len(prefix):-3] for name in os.listdir(self.directory)
+                if name.startswith(prefix) and name.endswith('.db')]
+
+    def collect(self):
+        self.own()
+        lock_path = os.path.join(self.directory, f'{self.layout}.lock')
+        with open(lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for name in self._files():
+                try:
+                    os.kill(int(name), 0)
+                except ProcessLookupError:
+                    dead.append(name)
+                except (PermissionError, ValueError):
+                    pass
+            if dead:
+                self._archive(dead)
+            totals = [0.0] * (len(self.names) * SLOT_SIZE)
+            for name in self._files():
+                for i, value in enumerate(self._read(self.path(name))):
+                    totals[i] += value
+        return {
+            name: totals[slot:slot + SLOT_SIZE]
+            for name, slot in self.slots.items()
+            if any(totals[slot:slot + COUNT])
+        }
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None or _store.directory != settings.METRICS_DIR:
+        _store = Store(settings.METRICS_DIR)
+    return _store
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    # Goes first in MIDDLEWARE to time the whole request.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        metrics = _local.metrics = RequestMetrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        match = request.resolver_match
+        name = match.view_name if match and match.url_name else UNMATCHED
+        get_store().record(name, perf_counter() - start, metrics.queries,
+                           metrics.sql_time, metrics.template_time)
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None:
+            return super().render(context, request)
+        # Templates rendered from a template (post cards) are counted once.
+        metrics.template_depth += 1
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template,
+                             self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template,
+                             self)
+
+
+def _labels(view, **extra):
+    labels = {'view': view, **extra}
+    return ','.join(
+        f'{name}="{value}"' for name, value in labels.items())
+
+
+def render(collected):
+    lines = [
+        '# HELP yatube_request_duration_seconds Request latency.',
+        '# TYPE yatube_request_duration_seconds histogram',
+    ]
+    for view, values in collected.items():
+        cumulative = 0
+        for le, count in zip((*BUCKETS, '+Inf'), values[:COUNT]):
+            cumulative += count
+            lines.append(
+                f'yatube_request_duration_seconds_bucket'
+                f'{{{_labels(view, le=le)}}} {cumulative:g}')
+        lines.append(f'yatube_request_duration_seconds_sum'
+                     f'{{{_labels(view)}}} {values[DURATION]!r}')
+        lines.append(f'yatube_request_duration_seconds_count'
+                     f'{{{_labels(view)}}} {cumulative:g}')
+    for metric, index, help_text in (
+            ('yatube_sql_queries_total', QUERIES, 'SQL queries.'),
+            ('yatube_sql_seconds_total', SQL_TIME, 'Time in SQL queries.'),
+            ('yatube_template_seconds_total', TEMPLATE_TIME,
+             'Time rendering templates.')):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} counter')
+        for view, values in collected.items():
+            lines.append(f'{metric}{{{_labels(view)}}} {values[index]!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(get_store().collect()),
+                        content_type='text/plain; version=0.0.4')
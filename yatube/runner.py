@@ -0,0 +1,37 @@
+import os
+from contextlib import contextmanager
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+@contextmanager
+def testing_settings():
+    # The SQLite cache in a temporary file instead of the site's one, so
+    # test runs don't see each other's entries, and static files under
+    # their own names: the manifest only exists after collectstatic.
+    with TemporaryDirectory() as directory:
+        caches = deepcopy(settings.CACHES)
+        for alias, params in caches.items():
+            if params['BACKEND'] == 'yatube.cache.SQLiteCache':
+                params['LOCATION'] = os.path.join(
+                    directory, f'{alias}.sqlite3')
+        with override_settings(
+                CACHES=caches, STATICFILES_STORAGE=STATICFILES_STORAGE):
+            yield
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._settings = testing_settings()
+        self._settings.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
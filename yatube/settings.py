@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 from pathlib import Path
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR =  Path(__file__).resolve().parent.parent
@@ -50,11 +51,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.db.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,10 +68,17 @@ TEMPLATES_DIR = []
 TEMPLATES_DIR.append(os.path.join(BASE_DIR, 'templates'))
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': TEMPLATES_DIR,
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process, in
+            # development too: restart runserver after editing a template.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -87,11 +97,31 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Applied to every connection of the yatube.sqlite engine: WAL lets
+# readers run during writes, busy_timeout (ms) makes writers queue for the
+# lock instead of failing, the WAL is checkpointed every 1000 pages and
+# truncated to journal_size_limit bytes (see sqlite_checkpoint).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'wal_autocheckpoint': 1000,
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+# Aliases in DATABASES that serve feed and API list reads. After a write
+# the user reads from the primary for DATABASE_REPLICA_PIN seconds.
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PIN = 5
+DATABASE_ROUTERS = ['yatube.db.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -131,6 +161,9 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR.joinpath('static')
+# collectstatic writes content-hashed copies with .gz and .br siblings
+# for nginx, see yatube.staticfiles.
+STATICFILES_STORAGE = 'yatube.staticfiles.StaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR.joinpath('media')
@@ -143,9 +176,41 @@ LOGOUT_REDIRECT_URL = 'index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Keyset pagination for post feeds: "newer/older" links instead of page
+# numbers, no COUNT(*) and constant cost for deep pages.
+POSTS_CURSOR_PAGINATION = False
+
+# Rendered post cards are keyed by post version, so edits and comments
+# never serve a stale card and the timeout only bounds memory use.
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+
+# Uploaded post images are downscaled to POST_IMAGE_MAX_SIZE pixels on
+# the longer side and re-encoded as POST_IMAGE_FORMAT without metadata.
+POST_IMAGE_MAX_SIZE = 1920
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+
+# Uploads larger than this are spooled to a temporary file, not memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
+# Feed thumbnails are generated by a process pool outside of requests.
+# Every gunicorn worker starts its own pool of this many processes.
+THUMBNAIL_WORKERS = 1
+
+# Every worker adds its request metrics to a file here, /metrics sums
+# them up. Keep it on a local (ideally tmpfs) filesystem.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube_metrics')
+
+# Tests run with the cache in a temporary file, see yatube/runner.py.
+TEST_RUNNER = 'yatube.runner.TestRunner'
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
@@ -154,10 +219,20 @@ REST_FRAMEWORK = {
             'rest_framework.permissions.IsAuthenticated',
         ],
         'DEFAULT_AUTHENTICATION_CLASSES': [
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'api.authentication.CachedJWTAuthentication',
         ],
+        'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
+        'PAGE_SIZE': 20,
     }
 
+# Users authenticated by a token are kept in each process for this many
+# seconds, up to API_USER_CACHE_SIZE of them.
+API_USER_CACHE_TTL = 30
+API_USER_CACHE_SIZE = 10000
+
+# Follow suggestions kept per user, recomputed by update_suggestions.
+SUGGESTIONS_SIZE = 10
+
 
 if LOGGING:
     LOGGING = {
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite for several gunicorn workers sharing one database file.
+
+    settings.SQLITE_PRAGMAS are applied to every new connection, and
+    transactions take the write lock when they begin.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads and then writes, like
+        # get_or_create(), fails at once with "database is locked" when
+        # another connection writes: busy_timeout only covers waiting
+        # for the lock at BEGIN IMMEDIATE.
+        self.cursor().execute('BEGIN IMMEDIATE')
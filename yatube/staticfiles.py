@@ -0,0 +1,48 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+# Every hashed file with one of these extensions gets .gz and .br
+# siblings: nginx picks the .br one without checking that it exists.
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg')
+
+
+class StaticFilesStorage(ManifestStaticFilesStorage):
+    """collectstatic copies every file under a name with the hash of its
+    content (staticfiles.json maps the names) and writes gzip and brotli
+    versions next to the hashed css, js and svg files."""
+
+    def stored_name(self, name):
+        # Not collected yet in development: the file's own name. Without
+        # DEBUG a missing file stays an error.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if not settings.DEBUG:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                self._compress(name)
+
+    def _compress(self, name):
+        import brotli
+
+        path = self.path(name)
+        # Hashed names change with the content, existing siblings are
+        # up to date.
+        if os.path.exists(path + '.br') and os.path.exists(path + '.gz'):
+            return
+        with open(path, 'rb') as source:
+            content = source.read()
+        with open(path + '.gz', 'wb') as target:
+            target.write(gzip.compress(content, 9, mtime=0))
+        with open(path + '.br', 'wb') as target:
+            target.write(brotli.compress(content))
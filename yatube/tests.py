@@ -0,0 +1,264 @@
+import gzip
+import os
+import sqlite3
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+
+from posts.graph import FollowGraph
+from posts.models import Follow, Post, User
+from .cache import SQLiteCache
+from .metrics import get_store
+from .db import ReplicaPinMiddleware, pin_key, read_replica
+from .sqlite.base import DatabaseWrapper
+from .staticfiles import StaticFilesStorage
+
+
+def incr_many(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_set(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertIsNone(self.cache.get('missing'))
+
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertFalse(self.cache.add('expired', 3))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+        self.cache.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.cache.get_many(['a', 'c', 'x']), {'a': 1, 'c': 3})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_shared_between_instances(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value',
+                         msg='Кэш не разделяется между экземплярами')
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 5, 'ACCESS_RESOLUTION': 0}})
+        for i in range(10):
+            cache.set(i, i)
+        cache.get(0)
+        cache.set('new', 'value')
+        self.assertEqual(cache.get(0), 0,
+                         msg='Вытеснена недавно использованная запись')
+        self.assertIsNone(cache.get(1), msg='Не вытеснена самая старая запись')
+        self.assertIsNone(cache.get(2), msg='Не вытеснена самая старая запись')
+
+    def test_cull_every(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_EVERY': 5}})
+
+        def count():
+            return cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+        for i in range(14):
+            cache.set(i, i)
+        self.assertEqual(count(), 14, msg='Кэш пересчитывает записи при каждой записи')
+        cache.set(14, 14)
+        self.assertEqual(count(), 10, msg='Кэш не вытесняет записи сверх MAX_ENTRIES')
+
+        cache.set_many({i: i for i in range(20, 35)})
+        self.assertEqual(count(), 10, msg='Кэш не учитывает записи set_many при вытеснении')
+
+    def test_incr_across_processes(self):
+        self.cache.set('counter', 0)
+        ctx = get_context('fork')
+        processes = [ctx.Process(target=incr_many, args=(self.path, 50))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200,
+                         msg='incr теряет обновления при конкурентном доступе')
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def write(self, request):
+        router.db_for_write(Post)
+        return HttpResponse()
+
+    def test_reads_inside_read_replica(self):
+        self.request.user = AnonymousUser()
+        with read_replica(self.request):
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_pinned_after_write(self):
+        ReplicaPinMiddleware(self.write)(self.request)
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+        with read_replica(self.request):
+            self.assertEqual(router.db_for_read(Post), 'default')
+
+        self.request.user = User.objects.create_user(username='reader')
+        with read_replica(self.request):
+            self.assertEqual(router.db_for_read(Post), 'replica')
+
+    def test_comment_pins_author(self):
+        post = Post.objects.create(text='text', author=self.user)
+        self.client.force_login(self.user)
+        self.client.post(f'/{self.user.username}/{post.id}/comment/',
+                         {'text': 'comment'})
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+
+    def test_graph_loaded_from_primary(self):
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        self.request.user = AnonymousUser()
+        with read_replica(self.request):
+            graph = FollowGraph.load()
+        self.assertTrue(graph.is_following(self.user.pk, author.pk))
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'db.sqlite3')
+        self.db = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}, 'profile')
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+    def pragma(self, name):
+        with self.db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_transaction_takes_write_lock(self):
+        self.db.ensure_connection()
+        self.db._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+        other.close()
+        self.db.connection.rollback()
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.settings = override_settings(METRICS_DIR=self.tmp_dir.name)
+        self.settings.enable()
+        cache.clear()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmp_dir.cleanup()
+
+    def metrics(self):
+        lines = self.client.get('/metrics').content.decode().splitlines()
+        return dict(line.rsplit(' ', 1) for line in lines
+                    if not line.startswith('#'))
+
+    def test_metrics_per_view(self):
+        self.client.get('/')
+        self.client.get('/')
+        self.client.get('/api/v1/group/')
+        self.client.get('/no/such/page/here/')
+        metrics = self.metrics()
+
+        self.assertEqual(
+            metrics['yatube_request_duration_seconds_count{view="index"}'],
+            '2')
+        self.assertEqual(metrics[
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"}'
+        ], '2')
+        self.assertEqual(metrics[
+            'yatube_request_duration_seconds_count{view="group-list"}'], '1')
+        self.assertEqual(metrics[
+            'yatube_request_duration_seconds_count{view="<unmatched>"}'],
+            '1')
+        self.assertGreater(
+            float(metrics['yatube_sql_queries_total{view="index"}']), 0)
+        self.assertGreater(
+            float(metrics['yatube_template_seconds_total{view="index"}']), 0)
+        self.assertEqual(
+            float(metrics['yatube_template_seconds_total{view="group-list"}']),
+            0)
+
+    def test_dead_workers_archived(self):
+        store = get_store()
+        store.record('index', 0.2, 3, 0.01, 0.05)
+        os.rename(store.path(os.getpid()), store.path(2 ** 22 + 1))
+        store.pid = None
+
+        self.client.get('/')
+        metrics = self.metrics()
+        self.assertEqual(
+            metrics['yatube_request_duration_seconds_count{view="index"}'],
+            '2')
+        self.assertFalse(os.path.exists(store.path(2 ** 22 + 1)))
+        self.assertTrue(os.path.exists(store.path('archive')))
+
+
+
+class StaticFilesTest(SimpleTestCase):
+    def test_hashed_and_precompressed(self):
+        import brotli
+
+        css = b'body { color: red; }\n' * 100
+        with TemporaryDirectory() as tmp_dir:
+            storage = StaticFilesStorage(location=tmp_dir)
+            storage.save('css/site.css', ContentFile(css))
+            storage.save('img/logo.png', ContentFile(b'png'))
+            list(storage.post_process({
+                name: (storage, name) for name in ('css/site.css', 'img/logo.png')}))
+
+            storage = StaticFilesStorage(location=tmp_dir)
+            name = storage.stored_name('css/site.css')
+            self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+            with storage.open(name + '.gz') as compressed:
+                self.assertEqual(gzip.decompress(compressed.read()), css)
+            with storage.open(name + '.br') as compressed:
+                self.assertEqual(brotli.decompress(compressed.read()), css)
+            self.assertFalse(storage.exists(storage.stored_name('img/logo.png') + '.gz'))
+            with self.assertRaises(ValueError):
+                storage.stored_name('js/missing.js')
+            with override_settings(DEBUG=True):
+                self.assertEqual(storage.stored_name('js/missing.js'), 'js/missing.js')
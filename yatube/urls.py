@@ -4,6 +4,7 @@ from django.conf.urls import handler404, handler500
 from django.views.generic import TemplateView
 
 from posts.views import Error404View, Error500View
+from .metrics import metrics_view
 
 handler404 = Error404View.get_rendered_view()  # noqa
 handler500 = Error500View.get_rendered_view()  # noqa
@@ -14,6 +15,7 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('redoc/', TemplateView.as_view(template_name='redoc.html'),
          name='redoc'),
     path('', include('posts.urls')),